@@ -9,6 +9,7 @@ from sqlmodel import SQLModel
 
 import app.models  # noqa 'autogenerate'
 from alembic import context
+from app.core.login_events import PARTITION_NAME
 from app.core.settings import settings
 
 # this is the Alembic Config object, which provides
@@ -33,6 +34,12 @@ target_metadata.naming_convention = {
     "pk": "pk_%(table_name)s",
 }
 
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """Skip `login_event` partitions, the app creates and drops them."""
+    return not (type_ == "table" and reflected and PARTITION_NAME.match(name))
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -55,6 +62,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -65,7 +73,11 @@ def run_migrations_offline() -> None:
 
 def do_run_migrations(connection: Connection) -> None:
     """Run migrations."""
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
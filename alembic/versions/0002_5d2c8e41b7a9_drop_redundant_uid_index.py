@@ -0,0 +1,27 @@
+"""drop redundant uid index.
+
+The primary key already indexes `auth_user.uid`, the extra unique index
+only doubled the index maintenance of every insert.
+
+Revision ID: 5d2c8e41b7a9
+Revises: aeea20dcf164
+Create Date: 2026-10-19 09:12:41.503217
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d2c8e41b7a9"
+down_revision = "aeea20dcf164"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade alembic commands."""
+    op.drop_index("ix_auth_user_uid", table_name="auth_user")
+
+
+def downgrade() -> None:
+    """Downgrade alembic commands."""
+    op.create_index("ix_auth_user_uid", "auth_user", ["uid"], unique=True)
@@ -0,0 +1,77 @@
+"""add login and partial indexes.
+
+Indexes are built with CREATE INDEX CONCURRENTLY, outside of the
+migration transaction, so the revision can run against a live database.
+A failed concurrent build leaves an INVALID index behind, it has to be
+dropped before running the revision again.
+
+The unique username index is rebuilt to cover the login columns, under a
+temporary name until the old one is dropped, so usernames stay unique
+throughout.
+
+Revision ID: 9b41f7c2e8d6
+Revises: 5d2c8e41b7a9
+Create Date: 2026-10-19 10:04:18.227561
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9b41f7c2e8d6"
+down_revision = "5d2c8e41b7a9"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    "ix_auth_user_active_uid",
+    "ix_auth_user_staff_uid",
+)
+
+
+def replace_username_index(**kwargs) -> None:
+    """Replace the unique username index by one built with kwargs."""
+    op.create_index(
+        "ix_auth_user_username_new",
+        "auth_user",
+        ["username"],
+        unique=True,
+        postgresql_concurrently=True,
+        **kwargs,
+    )
+    op.drop_index(
+        "ix_auth_user_username", table_name="auth_user", postgresql_concurrently=True
+    )
+    op.execute("ALTER INDEX ix_auth_user_username_new RENAME TO ix_auth_user_username")
+
+
+def upgrade() -> None:
+    """Upgrade alembic commands."""
+    with op.get_context().autocommit_block():
+        # login lookups are answered by an index only scan.
+        replace_username_index(
+            postgresql_include=["hashed_password", "is_active", "uid"]
+        )
+        op.create_index(
+            "ix_auth_user_active_uid",
+            "auth_user",
+            ["uid"],
+            postgresql_where=sa.text("is_active"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_auth_user_staff_uid",
+            "auth_user",
+            ["uid"],
+            postgresql_where=sa.text("is_staff"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade alembic commands."""
+    with op.get_context().autocommit_block():
+        for name in reversed(INDEXES):
+            op.drop_index(name, table_name="auth_user", postgresql_concurrently=True)
+        replace_username_index()
@@ -0,0 +1,32 @@
+"""lowercase usernames and emails.
+
+Logins are matched against lowercased usernames and emails, rows written
+before the application normalized them are lowercased here. The revision
+fails on usernames or emails that only differ by case, those have to be
+merged by hand first.
+
+Revision ID: c3e7a5d19f20
+Revises: 9b41f7c2e8d6
+Create Date: 2026-10-19 11:36:52.840193
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c3e7a5d19f20"
+down_revision = "9b41f7c2e8d6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade alembic commands."""
+    op.execute(
+        "UPDATE auth_user"
+        " SET username = lower(btrim(username)), email = lower(btrim(email))"
+        " WHERE username <> lower(btrim(username)) OR email <> lower(btrim(email))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade alembic commands, original casing is not recoverable."""
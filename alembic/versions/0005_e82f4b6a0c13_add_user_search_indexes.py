@@ -0,0 +1,43 @@
+"""add user search indexes.
+
+`text_pattern_ops` indexes support LIKE 'prefix%' lookups regardless of
+the database collation. Built concurrently, see revision 9b41f7c2e8d6.
+
+Revision ID: e82f4b6a0c13
+Revises: c3e7a5d19f20
+Create Date: 2026-10-19 12:48:09.611874
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e82f4b6a0c13"
+down_revision = "c3e7a5d19f20"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("first_name", "last_name", "username", "email")
+
+
+def upgrade() -> None:
+    """Upgrade alembic commands."""
+    with op.get_context().autocommit_block():
+        for column in COLUMNS:
+            op.create_index(
+                f"ix_auth_user_{column}_pattern",
+                "auth_user",
+                [column],
+                postgresql_ops={column: "text_pattern_ops"},
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade alembic commands."""
+    with op.get_context().autocommit_block():
+        for column in reversed(COLUMNS):
+            op.drop_index(
+                f"ix_auth_user_{column}_pattern",
+                table_name="auth_user",
+                postgresql_concurrently=True,
+            )
@@ -0,0 +1,69 @@
+"""add login event table.
+
+`login_event` is range partitioned by month. Partitions of the current and
+the next two months are created here, the application creates upcoming
+ones and drops expired ones, see `app.core.login_events`.
+
+Revision ID: 4a9d0e7b53f8
+Revises: e82f4b6a0c13
+Create Date: 2026-10-19 14:21:37.095512
+
+"""
+from datetime import date
+
+import sqlalchemy as sa
+import sqlmodel
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4a9d0e7b53f8"
+down_revision = "e82f4b6a0c13"
+branch_labels = None
+depends_on = None
+
+
+def month_start(year: int, month: int) -> date:
+    """Get first day of month, month may overflow into the next years."""
+    return date(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    """Upgrade alembic commands."""
+    op.create_table(
+        "login_event",
+        sa.Column("uid", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("occurred_at", sa.DateTime(), nullable=False),
+        sa.Column("user_uid", sqlmodel.sql.sqltypes.GUID(), nullable=True),
+        sa.Column(
+            "login", sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False
+        ),
+        sa.Column(
+            "ip_address", sqlmodel.sql.sqltypes.AutoString(length=45), nullable=True
+        ),
+        sa.Column(
+            "user_agent", sqlmodel.sql.sqltypes.AutoString(length=500), nullable=True
+        ),
+        sa.Column("success", sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint("uid", "occurred_at"),
+        postgresql_partition_by="RANGE (occurred_at)",
+    )
+    op.create_index(
+        "ix_login_event_user_uid_occurred_at",
+        "login_event",
+        ["user_uid", "occurred_at"],
+    )
+    today = date.today()
+    for i in range(3):
+        start = month_start(today.year, today.month + i)
+        end = month_start(today.year, today.month + i + 1)
+        op.execute(
+            f"CREATE TABLE login_event_y{start.year}m{start.month:02d}"
+            f" PARTITION OF login_event FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade alembic commands."""
+    op.drop_index("ix_login_event_user_uid_occurred_at", table_name="login_event")
+    op.drop_table("login_event")
@@ -0,0 +1,40 @@
+"""add idempotency key table.
+
+Revision ID: b6f3c1d8e925
+Revises: 4a9d0e7b53f8
+Create Date: 2026-10-19 15:40:26.731408
+
+"""
+import sqlalchemy as sa
+import sqlmodel
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b6f3c1d8e925"
+down_revision = "4a9d0e7b53f8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade alembic commands."""
+    op.create_table(
+        "idempotency_key",
+        sa.Column("subject", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("key", sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+        sa.Column(
+            "fingerprint", sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False
+        ),
+        sa.Column("status_code", sa.Integer(), nullable=True),
+        sa.Column("response_body", sa.LargeBinary(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("subject", "key"),
+    )
+    op.create_index("ix_idempotency_key_created_at", "idempotency_key", ["created_at"])
+
+
+def downgrade() -> None:
+    """Downgrade alembic commands."""
+    op.drop_index("ix_idempotency_key_created_at", table_name="idempotency_key")
+    op.drop_table("idempotency_key")
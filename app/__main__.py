@@ -0,0 +1,176 @@
+"""Production server entry point module.
+
+Runs the app under gunicorn with uvicorn workers when gunicorn is
+installed, under uvicorn's own process manager otherwise. Both use uvloop
+and httptools, and size the worker count from the cpu quota of the
+container rather than from the host cores.
+
+Asked to exit, a worker first fails readiness and rejects new requests for
+`drain_delay` seconds while still listening, so load balancers stop routing
+to it before its connections are refused.
+
+Usage:
+    python -m app
+    python -m app --workers 4 --preload
+"""
+import argparse
+import os
+import sys
+from time import monotonic
+from types import FrameType
+from typing import Any, Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from app.core.settings import settings
+from app.utils.cpu import available_cpus
+
+APP = "app.main:app"
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    """Drop pooled connections a preloaded app inherited from the master."""
+    from app.core.db import async_engine
+
+    # close=False leaves the sockets to the parent instead of closing them,
+    # sqlalchemy2-stubs do not know it yet.
+    async_engine.sync_engine.dispose(close=False)  # type: ignore
+
+
+class DrainingServer(uvicorn.Server):
+    """Uvicorn server that drains for `drain_delay` seconds before exiting.
+
+    Uvicorn closes its listener as soon as it is asked to exit and runs the
+    lifespan shutdown after, too late for a client to see the drain. The
+    first SIGTERM or SIGINT starts it here instead, the server exits once
+    the delay is over. A second signal exits right away.
+    """
+
+    exit_at: Optional[float] = None
+
+    def handle_exit(self, sig: int, frame: Optional[FrameType]) -> None:
+        """Start draining, exit on a second signal."""
+        if self.exit_at is not None or settings.drain_delay <= 0:
+            super().handle_exit(sig, frame)
+            return
+        from app.core.lifecycle import drain
+
+        drain.start()
+        self.exit_at = monotonic() + settings.drain_delay
+
+    async def on_tick(self, counter: int) -> bool:
+        """Get whether to exit, once the drain delay is over."""
+        if self.exit_at is not None and monotonic() >= self.exit_at:
+            return True
+        return await super().on_tick(counter)
+
+
+def run_gunicorn(args: argparse.Namespace) -> None:
+    """Run app under gunicorn with uvicorn workers."""
+    from gunicorn.app.base import BaseApplication  # type: ignore
+    from gunicorn.arbiter import Arbiter  # type: ignore
+    from uvicorn.workers import UvicornWorker
+
+    class Worker(UvicornWorker):
+        CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
+
+        async def _serve(self) -> None:
+            # `UvicornWorker._serve`, with the draining server.
+            self.config.app = self.wsgi
+            server = DrainingServer(config=self.config)
+            self._install_sigquit_handler()
+            await server.serve(sockets=self.sockets)
+            if not server.started:
+                sys.exit(Arbiter.WORKER_BOOT_ERROR)
+
+    class Application(BaseApplication):
+        def load_config(self) -> None:
+            options = {
+                "bind": f"{args.host}:{args.port}",
+                "workers": args.workers,
+                "worker_class": Worker,
+                "preload_app": args.preload,
+                "keepalive": settings.server_keepalive,
+                "backlog": settings.server_backlog,
+                # leave the drain time to finish in-flight requests.
+                "graceful_timeout": settings.drain_delay + settings.drain_timeout + 5,
+                "post_fork": post_fork,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self) -> Any:
+            from app.main import app
+
+            return app
+
+    Application().run()
+
+
+def run_uvicorn(args: argparse.Namespace) -> None:
+    """Run app under uvicorn, which cannot preload it before forking."""
+    config = uvicorn.Config(
+        APP,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop",
+        http="httptools",
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keepalive,
+    )
+    # `uvicorn.run`, with the draining server.
+    server = DrainingServer(config=config)
+    if config.workers > 1:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+def gunicorn_installed() -> bool:
+    """Check if gunicorn can be imported."""
+    try:
+        import gunicorn  # type: ignore # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments, defaults come from settings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument("--workers", type=int, default=settings.server_workers)
+    parser.add_argument(
+        "--preload", action="store_true", default=settings.server_preload
+    )
+    parser.add_argument(
+        "--server", choices=("auto", "gunicorn", "uvicorn"), default="auto"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the server."""
+    args = parse_args(argv)
+    args.workers = args.workers or available_cpus()
+    # workers read it to size their bcrypt thread pool.
+    os.environ["SERVER_WORKERS"] = str(args.workers)
+    settings.server_workers = args.workers
+
+    use_gunicorn = args.server == "gunicorn" or (
+        args.server == "auto" and gunicorn_installed()
+    )
+    if use_gunicorn:
+        run_gunicorn(args)
+    else:
+        if args.preload:
+            print("--preload needs gunicorn, ignored.", file=sys.stderr)
+        run_uvicorn(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Admin diagnostics api endpoints module."""
+import tracemalloc
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from fastapi_jwt_auth import AuthJWT  # type: ignore
+from pydantic import BaseModel
+
+from app.api.v1.user import superuser_or_error, verified_claims
+from app.core.profiling import memory_snapshots, profile_store
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+AuthJWTDep = Annotated[AuthJWT, Depends()]
+
+
+class MemoryStat(BaseModel):
+    """Memory allocated by one source line."""
+
+    location: str
+    size: int
+    count: int
+    size_diff: int = 0
+    count_diff: int = 0
+
+
+class MemorySnapshotRead(BaseModel):
+    """Memory snapshot read model."""
+
+    snapshot_id: str
+    stats: list[MemoryStat]
+
+
+async def superuser_required(Authorize: AuthJWTDep) -> None:
+    """Dependency that allows superusers only."""
+    await superuser_or_error(verified_claims(Authorize))
+
+
+def _location(trace: tracemalloc.Frame) -> str:
+    return f"{trace.filename}:{trace.lineno}"
+
+
+@router.get("/profiles", dependencies=[Depends(superuser_required)])
+async def read_profiles() -> list[str]:
+    """Read ids of the stored request profiles."""
+    return profile_store.ids()
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(superuser_required)],
+)
+async def read_profile(profile_id: str) -> PlainTextResponse:
+    """Read request profile in collapsed stack format."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="profile not found."
+        )
+    return PlainTextResponse(profile)
+
+
+@router.post(
+    "/tracemalloc/start",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(superuser_required)],
+)
+async def start_tracemalloc(frames: int = 1) -> None:
+    """Start tracing memory allocations."""
+    memory_snapshots.start(frames)
+
+
+@router.post(
+    "/tracemalloc/stop",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(superuser_required)],
+)
+async def stop_tracemalloc() -> None:
+    """Stop tracing memory allocations."""
+    memory_snapshots.stop()
+
+
+@router.post(
+    "/tracemalloc/snapshots",
+    response_model=MemorySnapshotRead,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(superuser_required)],
+)
+async def take_memory_snapshot(limit: int = 20) -> MemorySnapshotRead:
+    """Take memory snapshot and read its biggest allocations."""
+    if not tracemalloc.is_tracing():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="tracemalloc is not started.",
+        )
+    snapshot_id = memory_snapshots.take()
+    snapshot = memory_snapshots.get(snapshot_id)
+    stats = [
+        MemoryStat(
+            location=_location(stat.traceback[0]), size=stat.size, count=stat.count
+        )
+        for stat in snapshot.statistics("lineno")[:limit]  # type: ignore
+    ]
+    return MemorySnapshotRead(snapshot_id=snapshot_id, stats=stats)
+
+
+@router.get(
+    "/tracemalloc/diff",
+    response_model=list[MemoryStat],
+    dependencies=[Depends(superuser_required)],
+)
+async def diff_memory_snapshots(
+    first: str, second: str, limit: int = 20
+) -> list[MemoryStat]:
+    """Compare two memory snapshots, biggest growth first."""
+    old, new = memory_snapshots.get(first), memory_snapshots.get(second)
+    if old is None or new is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="snapshot not found."
+        )
+    return [
+        MemoryStat(
+            location=_location(stat.traceback[0]),
+            size=stat.size,
+            count=stat.count,
+            size_diff=stat.size_diff,
+            count_diff=stat.count_diff,
+        )
+        for stat in new.compare_to(old, "lineno")[:limit]
+    ]
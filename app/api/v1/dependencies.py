@@ -1,13 +1,49 @@
 """User information api dependencies module."""
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from fastapi import Depends
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.api.v1.user_cache import CachedUserRepository, user_stats_cache
 from app.api.v1.user_crud import UserCRUD
+from app.api.v1.user_memory import memory_users
+from app.api.v1.user_repository import UserRepository
 from app.core.db import get_async_session
+from app.core.idempotency import IdempotencyKeys
+from app.core.settings import settings
+from app.models.user import UserStats
+
+if settings.user_backend == "memory":
+    # no database session is opened, the backend must run without one.
+
+    async def get_user_crud() -> UserRepository:
+        """Dependency function that provides the in process user repository."""
+        return CachedUserRepository(memory_users, user_stats_cache)
+
+    async def get_idempotency_keys() -> Optional[IdempotencyKeys]:
+        """Dependency function, keys are not stored without a database."""
+        return None
+
+    async def read_user_stats() -> UserStats:
+        """Count users of the in process repository."""
+        return await memory_users.stats()
+
+else:
+
+    async def get_user_crud(  # type: ignore
+        session: AsyncSession = Depends(get_async_session),
+    ) -> UserRepository:
+        """Dependency function that initialize user crud operations class."""
+        return CachedUserRepository(UserCRUD(session=session), user_stats_cache)
 
+    async def get_idempotency_keys(  # type: ignore
+        session: AsyncSession = Depends(get_async_session),
+    ) -> Optional[IdempotencyKeys]:
+        """Dependency function that initialize idempotency keys class."""
+        return IdempotencyKeys(session=session)
 
-async def get_user_crud(
-    session: AsyncSession = Depends(get_async_session),
-) -> UserCRUD:
-    """Dependency function that initialize user crud operations class."""
-    return UserCRUD(session=session)
+    async def read_user_stats() -> UserStats:
+        """Count users in a session of their own, opened on a stats cache miss."""
+        async with asynccontextmanager(get_async_session)() as session:
+            return await UserCRUD(session=session).stats()
@@ -2,25 +2,39 @@
 from datetime import datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi_jwt_auth import AuthJWT  # type: ignore
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from app.api.v1.dependencies import get_user_crud
-from app.api.v1.user_crud import UserCRUD
+from app.api.v1.user_repository import UserRepository
+from app.core import access_log, timing
+from app.core.admission import (
+    client_ip,
+    login_ip_throttle,
+    login_limiter,
+    login_username_throttle,
+    throttle_or_error,
+)
+from app.core.db import deadline
+from app.core.login_events import login_events
+from app.core.metrics import JWT_SECONDS
+from app.core.query_log import query_budget
 from app.models.user import UserRead, UserUpdate
 from app.security import password
+from app.security.jwks import KID
 
 router = APIRouter(prefix="/login", tags=["login"])
 
-UserCRUDDep = Annotated[UserCRUD, Depends(get_user_crud)]
+UserCRUDDep = Annotated[UserRepository, Depends(get_user_crud)]
 
 
 class LoginCredential(BaseModel):
     """Users login credentials model."""
 
-    username: str
-    password: str
+    username: str = Field(description="username or email.")
+    # kept out of repr, so a logged model cannot leak it.
+    password: str = Field(repr=False)
 
 
 class LoginResponse(BaseModel):
@@ -30,27 +44,48 @@ class LoginResponse(BaseModel):
     user: UserRead
 
 
-@router.post("", response_model=LoginResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "",
+    response_model=LoginResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(query_budget(2)), Depends(deadline(3.0))],
+)
 async def login(
+    request: Request,
     credentials: LoginCredential,
     users: UserCRUDDep,
     Authorize: AuthJWT = Depends(),
 ) -> LoginResponse:
     """Login user."""
-    user = await users.read_by_username(credentials.username)
-    if not (
-        user and password.verify_password(credentials.password, user.hashed_password)
-    ):
+    ip_address = client_ip(request)
+    user_agent = request.headers.get("user-agent")
+    throttle_or_error(login_ip_throttle, ip_address)
+    throttle_or_error(login_username_throttle, credentials.username.strip().lower())
+
+    async with login_limiter.slot():
+        found = await users.read_login_credentials(credentials.username)
+        with timing.phase("bcrypt-verify"):
+            verified = found is not None and await password.verify_password_async(
+                credentials.password, found.hashed_password
+            )
+    login_events.record(
+        found.uid if found else None,
+        credentials.username,
+        ip_address,
+        user_agent,
+        success=bool(found and verified and found.is_active),
+    )
+    if not (found and verified):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="invalid username or password.",
         )
-    if user and user.is_active is False:
+    if found.is_active is False:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="inactive user."
         )
     user = await users.update_user(
-        user.uid, payload=UserUpdate(last_login=datetime.now(), modified_by=user.uid)
+        found.uid, payload=UserUpdate(last_login=datetime.now(), modified_by=found.uid)
     )
 
     if user is None:
@@ -63,7 +98,9 @@ async def login(
         "is_staff": user.is_staff,
         "is_active": user.is_active,
     }
-    access_token = Authorize.create_access_token(
-        subject=str(user.uid), user_claims=user_claims
-    )
+    with JWT_SECONDS.time("sign"), timing.phase("jwt-sign"):
+        access_token = Authorize.create_access_token(
+            subject=str(user.uid), user_claims=user_claims, headers={"kid": KID}
+        )
+    access_log.set_subject(str(user.uid))
     return LoginResponse(access_token=access_token, user=UserRead(**user.dict()))
@@ -1,12 +1,38 @@
 """Public key serving endpoint module."""
-from fastapi import APIRouter
+from typing import Optional
 
+import orjson
+from fastapi import APIRouter, Header, Response, status
+
+from app.api.v1.user import entity_tags
 from app.core.settings import settings
+from app.security.jwks import JWK, KID
 
 router = APIRouter(prefix="/public-key", tags=["public_key"])
 
+# the key only changes with a restart, clients revalidate with the ETag.
+ETAG = f'"{KID}"'
+CACHE_CONTROL = "public, max-age=300"
+PUBLIC_KEY = orjson.dumps({"public_key": settings.authjwt_public_key, "kid": KID})
+JWKS = orjson.dumps({"keys": [JWK]})
+
+
+def key_response(content: bytes, if_none_match: Optional[str]) -> Response:
+    """Get response serving content, `304` when the client has it already."""
+    headers = {"ETag": ETAG, "Cache-Control": CACHE_CONTROL}
+    tags = entity_tags(if_none_match)
+    if ETAG in tags or "*" in tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
 
 @router.get("")
-async def get_public_key():
+async def get_public_key(if_none_match: Optional[str] = Header(default=None)):
     """Serve public key."""
-    return {"public_key": settings.authjwt_public_key}
+    return key_response(PUBLIC_KEY, if_none_match)
+
+
+@router.get("/jwks")
+async def get_jwks(if_none_match: Optional[str] = Header(default=None)):
+    """Serve public key as a json web key set, tokens name it in their `kid`."""
+    return key_response(JWKS, if_none_match)
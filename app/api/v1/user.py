@@ -1,26 +1,81 @@
 """User api endpoints module."""
-from typing import Annotated, Optional
+import re
+from collections.abc import Sequence
+from typing import Annotated, Any, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from fastapi_jwt_auth import AuthJWT  # type: ignore
 from sqlalchemy.exc import IntegrityError
 
-from app.api.v1.dependencies import get_user_crud
-from app.api.v1.user_crud import UserCRUD
+from app.api.v1.dependencies import get_idempotency_keys, get_user_crud, read_user_stats
+from app.api.v1.user_cache import user_stats_cache
+from app.api.v1.user_crud import PreconditionFailed, entity_tag, entity_tag_version
+from app.api.v1.user_repository import UserRepository, prepared_many
+from app.core import access_log, timing
+from app.core.db import deadline
+from app.core.idempotency import IdempotencyKeys, request_fingerprint
+from app.core.metrics import JWT_SECONDS
+from app.core.query_log import query_budget
 from app.models.user import (
+    UserBulkDeactivate,
+    UserBulkResult,
+    UserBulkResultMany,
+    UserBulkUpdate,
     UserCreate,
     UserCreateBase,
     UserRead,
     UserReadMany,
+    UserStats,
     UserUpdate,
     UserUpdateBase,
 )
 
 router = APIRouter(prefix="/users", tags=["user"])
 
-UserCRUDDep = Annotated[UserCRUD, Depends(get_user_crud)]
+UserCRUDDep = Annotated[UserRepository, Depends(get_user_crud)]
 AuthJWTDep = Annotated[AuthJWT, Depends()]
+IdempotencyKeysDep = Annotated[Optional[IdempotencyKeys], Depends(get_idempotency_keys)]
+
+ENTITY_TAG = re.compile(r'(?:W/)?("[^"]*")|(\*)')
+
+
+def entity_tags(header: Optional[str]) -> list[str]:
+    """Get entity tags of an If-Match or If-None-Match header."""
+    if not header:
+        return []
+    return [tag or wildcard for tag, wildcard in ENTITY_TAG.findall(header)]
+
+
+def selected_fields(
+    fields: Optional[str] = Query(
+        default=None,
+        description="comma separated user fields to return, eg. uid,username.",
+    )
+) -> tuple[str, ...]:
+    """Parse and validate the sparse fieldset query parameter."""
+    if not fields:
+        return ()
+    names = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [name for name in names if name not in UserRead.__fields__]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"unknown fields: {', '.join(unknown)}.",
+        )
+    return names
+
+
+FieldsDep = Annotated[tuple[str, ...], Depends(selected_fields)]
+
+
+def verified_claims(Authorize: AuthJWT) -> Optional[dict]:
+    """Verify access token and get its raw claims."""
+    with JWT_SECONDS.time("verify"), timing.phase("jwt-verify"):
+        Authorize.jwt_required()
+        claims = Authorize.get_raw_jwt()
+    access_log.set_subject(claims.get("sub") if claims else None)
+    return claims
 
 
 async def superuser_or_error(user_claims: Optional[dict]) -> None:
@@ -41,59 +96,242 @@ async def superuser_or_error(user_claims: Optional[dict]) -> None:
         )
 
 
-@router.post("", response_model=UserRead, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "",
+    response_model=UserRead,
+    status_code=status.HTTP_201_CREATED,
+    # claim key, insert user and store response with an idempotency key.
+    dependencies=[Depends(query_budget(3)), Depends(deadline(5.0))],
+)
 async def create_user(
-    payload: UserCreateBase, users: UserCRUDDep, Authorize: AuthJWTDep
+    payload: UserCreateBase,
+    users: UserCRUDDep,
+    keys: IdempotencyKeysDep,
+    Authorize: AuthJWTDep,
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
 ):
-    """Create User."""
-    Authorize.jwt_required()
-    user_claims = Authorize.get_raw_jwt()
+    """Create User, once per `Idempotency-Key` when the header is sent."""
+    user_claims = verified_claims(Authorize)
     await superuser_or_error(user_claims)
     subject = UUID(Authorize.get_jwt_subject())  # type: ignore
     create_payload = UserCreate(
         **payload.dict(), created_by=subject, modified_by=subject
     )
-    try:
-        user = await users.create_user(create_payload)
-    except IntegrityError:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="integrity error. eg. duplicate field or invalid field value.",
+
+    async def create() -> Response:
+        try:
+            user = await users.create_user(create_payload)
+        except IntegrityError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="integrity error. eg. duplicate field or invalid field value.",
+            )
+        return Response(
+            content=UserRead.from_orm(user).json(),
+            status_code=status.HTTP_201_CREATED,
+            media_type="application/json",
         )
-    return user
 
+    # keys is None when users are not kept in the database.
+    if idempotency_key is None or keys is None:
+        return await create()
+    fingerprint = request_fingerprint("POST", "users", payload.dict())
+    return await keys.run(subject, idempotency_key, fingerprint, create)
+
+
+def bulk_result(user_uids: Sequence[UUID], updated: set[UUID]) -> Response:
+    """Get response with the outcome of a bulk operation for each user."""
+    result = UserBulkResultMany(
+        updated=len(updated),
+        result=[
+            UserBulkResult(uid=uid, status="updated" if uid in updated else "not_found")
+            for uid in user_uids
+        ],
+    )
+    return Response(content=result.json(), media_type="application/json")
+
+
+async def prepared_bulk_update(payload: UserBulkUpdate) -> dict[UUID, dict[str, Any]]:
+    """Dependency that hashes the passwords of a bulk update.
+
+    It is declared before the repository, so no pooled connection is held
+    while the passwords are hashed.
+    """
+    values = await prepared_many(
+        [item.dict(exclude={"uid"}, exclude_unset=True) for item in payload.users]
+    )
+    return dict(zip((item.uid for item in payload.users), values))
 
-@router.get("", response_model=UserReadMany)
-async def read_many(users: UserCRUDDep, Authorize: AuthJWTDep):
-    """Read many users."""
-    Authorize.jwt_required()
-    user_claims = Authorize.get_raw_jwt()
+
+PreparedBulkUpdateDep = Annotated[
+    dict[UUID, dict[str, Any]], Depends(prepared_bulk_update)
+]
+
+
+@router.post(
+    "/bulk-update",
+    response_model=UserBulkResultMany,
+    # claim key, update users and store response with an idempotency key.
+    dependencies=[Depends(query_budget(3)), Depends(deadline(10.0))],
+)
+async def bulk_update_users(
+    payload: UserBulkUpdate,
+    updates: PreparedBulkUpdateDep,
+    users: UserCRUDDep,
+    keys: IdempotencyKeysDep,
+    Authorize: AuthJWTDep,
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+):
+    """Update many users in one transaction, none of them on a conflict."""
+    user_claims = verified_claims(Authorize)
     await superuser_or_error(user_claims)
-    user_list = await users.read_many()
-    return user_list
+    subject = UUID(Authorize.get_jwt_subject())  # type: ignore
+
+    async def update() -> Response:
+        try:
+            updated = await users.bulk_update(updates, modified_by=subject)
+        except IntegrityError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="integrity error. eg. duplicate field or invalid field value.",
+            )
+        return bulk_result(list(updates), updated)
+
+    if idempotency_key is None or keys is None:
+        return await update()
+    fingerprint = request_fingerprint("POST", "users/bulk-update", payload.dict())
+    return await keys.run(subject, idempotency_key, fingerprint, update)
 
 
-@router.get("/{user_uid}", response_model=UserRead)
-async def read_by_uid(user_uid: UUID, users: UserCRUDDep, Authorize: AuthJWTDep):
-    """Read user by uid."""
-    Authorize.jwt_required()
-    user_claims = Authorize.get_raw_jwt()
+@router.post(
+    "/bulk-deactivate",
+    response_model=UserBulkResultMany,
+    dependencies=[Depends(query_budget(1)), Depends(deadline(10.0))],
+)
+async def bulk_deactivate_users(
+    payload: UserBulkDeactivate,
+    users: UserCRUDDep,
+    Authorize: AuthJWTDep,
+):
+    """Mark many users as inactive in one transaction, it can be retried."""
+    user_claims = verified_claims(Authorize)
     await superuser_or_error(user_claims)
-    user = await users.read_by_uid(user_uid)
-    if user is None:
+    subject = UUID(Authorize.get_jwt_subject())  # type: ignore
+    user_uids = list(dict.fromkeys(payload.uids))
+    updated = await users.deactivate_many(user_uids, modified_by=subject)
+    return bulk_result(user_uids, updated)
+
+
+@router.get(
+    "",
+    response_model=UserReadMany,
+    dependencies=[Depends(query_budget(1)), Depends(deadline(5.0))],
+)
+async def read_many(
+    users: UserCRUDDep,
+    Authorize: AuthJWTDep,
+    fields: FieldsDep,
+    after: Optional[UUID] = Query(default=None, description="`next` of last page."),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    is_active: Optional[bool] = None,
+    is_staff: Optional[bool] = None,
+):
+    """Read many users, only the requested fields when `fields` is given."""
+    user_claims = verified_claims(Authorize)
+    await superuser_or_error(user_claims)
+    # rows are serialized straight to json, returning a response skips the
+    # revalidation against response_model, which only documents the schema.
+    content = await users.read_many_json(
+        fields, after=after, limit=limit, is_active=is_active, is_staff=is_staff
+    )
+    return Response(content=content, media_type="application/json")
+
+
+@router.get(
+    "/search",
+    response_model=UserReadMany,
+    dependencies=[Depends(query_budget(1)), Depends(deadline(2.0))],
+)
+async def search(
+    users: UserCRUDDep,
+    Authorize: AuthJWTDep,
+    fields: FieldsDep,
+    q: str = Query(min_length=1, max_length=100),
+    after: Optional[UUID] = Query(default=None, description="`next` of last page."),
+    limit: int = Query(default=20, ge=1, le=100),
+):
+    """Search users by first name, last name, username or email prefix."""
+    user_claims = verified_claims(Authorize)
+    await superuser_or_error(user_claims)
+    content = await users.search_json(q, limit, fields=fields, after=after)
+    return Response(content=content, media_type="application/json")
+
+
+# declared before "/{user_uid}", which would match it otherwise.
+@router.get(
+    "/stats",
+    response_model=UserStats,
+    # served from the cache, or by one aggregate.
+    dependencies=[Depends(query_budget(1)), Depends(deadline(2.0))],
+)
+async def stats(Authorize: AuthJWTDep):
+    """Count users, active, staff and superusers, cached for a few seconds.
+
+    A session is only opened on a cache miss, cached stats cost no pooled
+    connection.
+    """
+    user_claims = verified_claims(Authorize)
+    await superuser_or_error(user_claims)
+    return await user_stats_cache.fetch(read_user_stats)
+
+
+@router.get(
+    "/{user_uid}",
+    response_model=UserRead,
+    dependencies=[Depends(query_budget(1)), Depends(deadline(2.0))],
+)
+async def read_by_uid(
+    user_uid: UUID,
+    users: UserCRUDDep,
+    Authorize: AuthJWTDep,
+    fields: FieldsDep,
+    if_none_match: Optional[str] = Header(default=None),
+):
+    """Read user by uid, only the requested fields when `fields` is given."""
+    user_claims = verified_claims(Authorize)
+    await superuser_or_error(user_claims)
+    found = await users.read_json_by_uid(
+        user_uid, fields, if_none_match=entity_tags(if_none_match)
+    )
+    if found is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="user not found."
         )
-    return user
+    etag, content = found
+    if content is None:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return Response(
+        content=content, media_type="application/json", headers={"ETag": etag}
+    )
 
 
-@router.patch("/{user_uid}", response_model=UserRead)
+@router.patch(
+    "/{user_uid}",
+    response_model=UserRead,
+    dependencies=[Depends(query_budget(2)), Depends(deadline(5.0))],
+)
 async def update_user(
-    user_uid: UUID, payload: UserUpdateBase, users: UserCRUDDep, Authorize: AuthJWTDep
+    user_uid: UUID,
+    payload: UserUpdateBase,
+    response: Response,
+    users: UserCRUDDep,
+    Authorize: AuthJWTDep,
+    if_match: Optional[str] = Header(default=None),
 ):
-    """Update user."""
-    Authorize.jwt_required()
-    user_claims = Authorize.get_raw_jwt()
+    """Update user, only if it still matches `If-Match` when given."""
+    user_claims = verified_claims(Authorize)
     await superuser_or_error(user_claims)
     subject = UUID(Authorize.get_jwt_subject())  # type: ignore
 
@@ -102,9 +340,22 @@ async def update_user(
     if payload.last_name:
         payload.last_name.strip().lower()
     update_payload = UserUpdate(**payload.dict(exclude_unset=True), modified_by=subject)
-    user = await users.update_user(user_uid, update_payload)
+    # "*" matches any current version, so only existence is required.
+    versions = None
+    tags = entity_tags(if_match)
+    if tags and "*" not in tags:
+        parsed = (entity_tag_version(tag, user_uid) for tag in tags)
+        versions = [version for version in parsed if version is not None]
+    try:
+        user = await users.update_user(user_uid, update_payload, if_match=versions)
+    except PreconditionFailed:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="user was modified, fetch it again.",
+        )
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="user not found."
         )
+    response.headers["ETag"] = entity_tag(user.uid, user.date_modified)
     return user
@@ -0,0 +1,141 @@
+"""User repository caching module."""
+from collections.abc import Awaitable, Callable, Collection, Mapping
+from datetime import datetime
+from time import monotonic
+from typing import Any, Optional
+from uuid import UUID
+
+from app.api.v1.user_repository import UserRepository
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.models.user import UserCreate, UserDB, UserStats, UserUpdate
+
+# fields the stats count by, updates of other fields keep them valid.
+COUNTED_FIELDS = frozenset(("is_active", "is_staff", "is_superuser"))
+
+
+class StatsCache:
+    """User stats kept for `ttl` seconds, dropped by `invalidate`.
+
+    Every invalidation starts a new generation. Stats read before it are
+    not stored, so a read racing a write cannot cache pre-write counts.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        """Stats cache initializer."""
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = self.misses = 0
+        self._stats: Optional[UserStats] = None
+        self._expires_at = 0.0
+
+    def get(self) -> Optional[UserStats]:
+        """Get cached stats unless they expired."""
+        if self._stats is not None and monotonic() < self._expires_at:
+            self.hits += 1
+            return self._stats
+        self.misses += 1
+        return None
+
+    def put(self, stats: UserStats, generation: int) -> None:
+        """Cache stats read during generation, unless it has ended."""
+        if generation == self.generation:
+            self._stats = stats
+            self._expires_at = monotonic() + self.ttl
+
+    def invalidate(self) -> None:
+        """Drop cached stats."""
+        self.generation += 1
+        self._stats = None
+
+    async def fetch(self, read: Callable[[], Awaitable[UserStats]]) -> UserStats:
+        """Get cached stats, or read and cache them on a miss."""
+        stats = self.get()
+        if stats is None:
+            generation = self.generation
+            stats = await read()
+            self.put(stats, generation)
+        return stats
+
+
+user_stats_cache = StatsCache(settings.user_stats_ttl_seconds)
+
+registry.callback(
+    "zaer_user_stats_cache_total",
+    "User stats requests answered from the cache or by the repository.",
+    ("outcome",),
+    "counter",
+    lambda: {
+        ("hit",): user_stats_cache.hits,
+        ("miss",): user_stats_cache.misses,
+    },
+)
+
+
+class CachedUserRepository:
+    """`UserRepository` decorator caching stats, dropped on writes.
+
+    Creates, deactivations and updates of a counted field invalidate the
+    stats, eg. the `last_login` update of every login does not. Only
+    writes of this worker do, those of other workers show up once the
+    stats expire.
+    """
+
+    def __init__(self, repository: UserRepository, cache: StatsCache) -> None:
+        """Cached user repository initializer."""
+        self.repository = repository
+        self.cache = cache
+
+    def __getattr__(self, name: str) -> Any:
+        """Get reads not cached here from the wrapped repository."""
+        return getattr(self.repository, name)
+
+    async def stats(self) -> UserStats:
+        """Count users, active, staff and superusers."""
+        return await self.cache.fetch(self.repository.stats)
+
+    async def create_user(self, payload: UserCreate) -> UserDB:
+        """Create user."""
+        try:
+            return await self.repository.create_user(payload)
+        finally:
+            self.cache.invalidate()
+
+    async def update_user(
+        self,
+        user_uid: UUID,
+        payload: UserUpdate,
+        if_match: Optional[Collection[datetime]] = None,
+    ) -> Optional[UserDB]:
+        """Update user."""
+        try:
+            return await self.repository.update_user(user_uid, payload, if_match)
+        finally:
+            if COUNTED_FIELDS & payload.__fields_set__:
+                self.cache.invalidate()
+
+    async def bulk_update(
+        self, updates: Mapping[UUID, dict[str, Any]], modified_by: UUID
+    ) -> set[UUID]:
+        """Update many users at once."""
+        try:
+            return await self.repository.bulk_update(updates, modified_by)
+        finally:
+            if any(COUNTED_FIELDS & values.keys() for values in updates.values()):
+                self.cache.invalidate()
+
+    async def deactivate_many(
+        self, user_uids: Collection[UUID], modified_by: UUID
+    ) -> set[UUID]:
+        """Mark many users as inactive at once."""
+        try:
+            return await self.repository.deactivate_many(user_uids, modified_by)
+        finally:
+            self.cache.invalidate()
+
+    async def delete_user(self, user_uid: UUID) -> bool:
+        """Mark user as inactive."""
+        try:
+            return await self.repository.delete_user(user_uid)
+        finally:
+            self.cache.invalidate()
@@ -1,16 +1,93 @@
 """User crud operations module."""
-from typing import Optional
+from collections.abc import Collection, Mapping, Sequence
+from datetime import datetime
+from typing import Any, Optional
 from uuid import UUID
 
+import orjson
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.models.user import UserCreate, UserDB, UserReadMany, UserUpdate
-from app.security import password
+from app.api.v1.user_repository import LoginCredentials, prepared_values
+from app.models.user import UserCreate, UserDB, UserRead, UserStats, UserUpdate
+
+# columns of `UserRead`, read without going through orm objects.
+READ_COLUMNS: tuple[sa.Column, ...] = tuple(
+    UserDB.__table__.c[name] for name in UserRead.__fields__  # type: ignore
+)
+
+
+def read_columns(fields: Sequence[str] = ()) -> tuple[sa.Column, ...]:
+    """Get columns of the requested `UserRead` fields, all of them by default."""
+    if not fields:
+        return READ_COLUMNS
+    return tuple(UserDB.__table__.c[name] for name in fields)  # type: ignore
+
+
+# columns a bulk update may set, null keeps the current value.
+BULK_COLUMNS = (
+    "first_name",
+    "last_name",
+    "username",
+    "email",
+    "hashed_password",
+    "is_superuser",
+    "is_staff",
+    "is_active",
+    "last_login",
+)
+
+
+def page_statement(
+    fields: Sequence[str] = (),
+    after: Optional[UUID] = None,
+    limit: Optional[int] = None,
+) -> sa.sql.Select:
+    """Get select of a page of users ordered by uid, with a `cursor` column."""
+    cursor = UserDB.uid.label("cursor")  # type: ignore
+    statement = sa.select(*read_columns(fields), cursor).order_by(UserDB.uid)
+    if after is not None:
+        statement = statement.where(UserDB.uid > after)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+
+def like_prefix(value: str) -> str:
+    """Get LIKE pattern matching values starting with value, `/` escaped."""
+    escaped = value.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return f"{escaped}%"
+
+
+def entity_tag(
+    user_uid: UUID, date_modified: datetime, fields: Sequence[str] = ()
+) -> str:
+    """Get the entity tag of a user representation."""
+    tag = f"{user_uid}:{date_modified:%Y%m%d%H%M%S%f}"
+    if fields:
+        tag = f"{tag}:{','.join(fields)}"
+    return f'"{tag}"'
+
+
+def entity_tag_version(tag: str, user_uid: UUID) -> Optional[datetime]:
+    """Get `date_modified` of the user an entity tag was derived from."""
+    uid, _, version = tag.strip('"').partition(":")
+    if uid != str(user_uid):
+        return None
+    try:
+        return datetime.strptime(version.split(":")[0], "%Y%m%d%H%M%S%f")
+    except ValueError:
+        return None
+
+
+class PreconditionFailed(Exception):
+    """The user was modified since the version the client holds."""
 
 
 class UserCRUD:
-    """Class defining all database related operations."""
+    """Class defining all database related operations, a `UserRepository`."""
 
     def __init__(self, session: AsyncSession) -> None:
         """Database operations class initializer."""
@@ -18,26 +95,96 @@ class UserCRUD:
 
     async def create_user(self, payload: UserCreate) -> UserDB:
         """Create user in the database."""
-        values = payload.dict()
-        hashed_password = password.get_password_hash(values["password"])
-        values["hashed_password"] = hashed_password
-        values["first_name"] = values["first_name"].strip().lower()
-        values["last_name"] = values["last_name"].strip().lower()
+        values = await prepared_values(payload.dict())
 
+        # every column is set client side, so there is nothing to refresh.
         user = UserDB(**values)
         self.session.add(user)
         await self.session.commit()
-        await self.session.refresh(user)
 
         return user
 
-    async def read_many(self) -> UserReadMany:
-        """Read many user records."""
-        statement = select(UserDB)
-        result = await self.session.exec(statement)  # type: ignore
-        all_result = result.all()
+    async def read_many_json(
+        self,
+        fields: Sequence[str] = (),
+        after: Optional[UUID] = None,
+        limit: Optional[int] = None,
+        is_active: Optional[bool] = None,
+        is_staff: Optional[bool] = None,
+    ) -> bytes:
+        """
+        Read many user records serialized as `UserReadMany` json.
+
+        Users are ordered by uid, which follows creation order. With `limit`
+        one page is read and `next` is the `after` of the following page.
+        """
+        statement = page_statement(fields, after, limit)
+        # literal predicates, a bound parameter would rule out the partial
+        # indexes once postgres switches to a generic plan.
+        if is_active is not None:
+            statement = statement.where(
+                UserDB.is_active if is_active else sa.not_(UserDB.is_active)
+            )
+        if is_staff is not None:
+            statement = statement.where(
+                UserDB.is_staff if is_staff else sa.not_(UserDB.is_staff)
+            )
+        return await self._page_json(statement, limit)
 
-        return UserReadMany(count=len(all_result), result=all_result)
+    async def search_json(
+        self,
+        query: str,
+        limit: int,
+        fields: Sequence[str] = (),
+        after: Optional[UUID] = None,
+    ) -> bytes:
+        """
+        Search users whose name, username or email starts with query.
+
+        Those columns are stored lowercased, so each prefix condition is an
+        index range scan of its `text_pattern_ops` index.
+        """
+        pattern = like_prefix(query.strip().lower())
+        columns = (UserDB.first_name, UserDB.last_name, UserDB.username, UserDB.email)
+        matches = (c.like(pattern, escape="/") for c in columns)  # type: ignore
+        statement = page_statement(fields, after, limit).where(sa.or_(*matches))
+        return await self._page_json(statement, limit)
+
+    async def _page_json(self, statement: sa.sql.Select, limit: Optional[int]) -> bytes:
+        """Run a `page_statement` select and serialize it as `UserReadMany` json."""
+        result = await self.session.execute(statement)
+        rows = [dict(row) for row in result.mappings()]
+        cursors = [row.pop("cursor") for row in rows]
+        next_uid = cursors[-1] if limit is not None and len(rows) == limit else None
+
+        return orjson.dumps({"count": len(rows), "result": rows, "next": next_uid})
+
+    async def read_json_by_uid(
+        self,
+        user_uid: UUID,
+        fields: Sequence[str] = (),
+        if_none_match: Collection[str] = (),
+    ) -> Optional[tuple[str, Optional[bytes]]]:
+        """
+        Read user by uid serialized as `UserRead` json, with its entity tag.
+
+        The json is not built, and None returned instead, when the entity
+        tag is one of `if_none_match`.
+        """
+        version = UserDB.date_modified.label("version")  # type: ignore
+        statement = sa.select(*read_columns(fields), version).where(
+            UserDB.uid == user_uid
+        )
+        result = await self.session.execute(statement)
+        row = result.mappings().one_or_none()
+        if row is None:
+            return None
+
+        values = dict(row)
+        etag = entity_tag(user_uid, values.pop("version"), fields)
+        if etag in if_none_match or "*" in if_none_match:
+            return etag, None
+        return etag, orjson.dumps(values)
 
     async def read_by_uid(self, user_uid: UUID) -> Optional[UserDB]:
         """Read user by uid."""
@@ -54,30 +201,147 @@ class UserCRUD:
         user = result.one_or_none()
         return user
 
+    async def exists(self, user_uid: UUID) -> bool:
+        """Check if user exists."""
+        statement = sa.select(sa.exists().where(UserDB.uid == user_uid))
+        result = await self.session.execute(statement)
+        return bool(result.scalar())
+
+    async def stats(self) -> UserStats:
+        """Count users, active, staff and superusers in one aggregate."""
+        table = UserDB.__table__  # type: ignore
+        count = sa.func.count()
+        statement = sa.select(
+            count.label("total"),
+            count.filter(UserDB.is_active).label("active"),  # type: ignore
+            count.filter(UserDB.is_staff).label("staff"),  # type: ignore
+            count.filter(UserDB.is_superuser).label("superusers"),  # type: ignore
+        ).select_from(table)
+        result = await self.session.execute(statement)
+        return UserStats(**result.mappings().one())
+
+    async def read_login_credentials(self, login: str) -> Optional[LoginCredentials]:
+        """
+        Read uid, hashed_password and is_active of user by username or email.
+
+        Usernames and emails are stored lowercased. A username lookup is
+        answered by an index only scan of the covering `ix_auth_user_username`, a
+        login that may be an email ORs both unique indexes in one statement.
+        When it is one user's username and another one's email, the username
+        wins, like in `InMemoryUserRepository`.
+        """
+        login = login.strip().lower()
+        is_username = UserDB.username == login
+        statement = sa.select(UserDB.uid, UserDB.hashed_password, UserDB.is_active)
+        if "@" in login:
+            matches = sa.or_(is_username, UserDB.email == login)  # type: ignore
+            statement = statement.where(matches).order_by(sa.desc(is_username))
+            statement = statement.limit(1)
+        else:
+            statement = statement.where(is_username)
+        result = await self.session.execute(statement)
+        row = result.one_or_none()
+        return LoginCredentials(*row) if row is not None else None
+
     async def update_user(
-        self, user_uid: UUID, payload: UserUpdate
+        self,
+        user_uid: UUID,
+        payload: UserUpdate,
+        if_match: Optional[Collection[datetime]] = None,
     ) -> Optional[UserDB]:
-        """Update user."""
-        user = await self.read_by_uid(user_uid)
-        if user is None:
+        """
+        Update user with a single UPDATE ... RETURNING statement.
+
+        With `if_match` the update only applies while the user `date_modified`
+        is one of the given versions, otherwise `PreconditionFailed` is raised.
+        """
+        values = await prepared_values(payload.dict(exclude_unset=True))
+        # set client side, it is the version compared by `if_match`.
+        values["date_modified"] = datetime.utcnow()
+
+        table = UserDB.__table__  # type: ignore
+        statement = (
+            sa.update(table)  # type: ignore
+            .where(UserDB.uid == user_uid)
+            .values(**values)
+            .returning(*table.c)  # type: ignore
+        )
+        if if_match is not None:
+            statement = statement.where(
+                UserDB.date_modified.in_(if_match)  # type: ignore
+            )
+        result = await self.session.execute(statement)
+        row = result.mappings().one_or_none()
+        await self.session.commit()
+
+        if row is None:
+            if if_match is not None and await self.exists(user_uid):
+                raise PreconditionFailed()
             return None
+        return UserDB(**row)
 
-        values = payload.dict(exclude_unset=True)
-        if values.get("password"):
-            values["hashed_password"] = password.get_password_hash(values["password"])
-            values.pop("password")
-        if values.get("first_name"):
-            values["first_name"] = values["first_name"].strip().lower()
-        if values.get("last_name"):
-            values["last_name"] = values["last_name"].strip().lower()
-        for k, v in values.items():
-            setattr(user, k, v)
+    async def bulk_update(
+        self, updates: Mapping[UUID, dict[str, Any]], modified_by: UUID
+    ) -> set[UUID]:
+        """
+        Update many users with a single UPDATE ... FROM unnest(...) statement.
 
-        self.session.add(user)
+        Each column is sent as one array parameter, row i of the unnested
+        arrays holds the values of user i. A column a user update leaves
+        unset is null there and keeps its current value.
+        """
+        table = UserDB.__table__  # type: ignore
+        columns = [
+            sa.column(name, table.c[name].type)  # type: ignore
+            for name in ("uid", *BULK_COLUMNS)
+        ]
+        arrays = [list(updates)] + [
+            [values.get(name) for values in updates.values()] for name in BULK_COLUMNS
+        ]
+        source = (
+            sa.func.unnest(
+                *(
+                    sa.cast(sa.literal(array, ARRAY(c.type)), ARRAY(c.type))
+                    for array, c in zip(arrays, columns)
+                )
+            )
+            .table_valued(*columns)
+            .render_derived(name="v")
+        )
+        values: dict[str, Any] = {
+            name: sa.func.coalesce(source.c[name], table.c[name])  # type: ignore
+            for name in BULK_COLUMNS
+        }
+        values.update(modified_by=modified_by, date_modified=datetime.utcnow())
+        statement = (
+            sa.update(table)  # type: ignore
+            .where(UserDB.uid == source.c.uid)
+            .values(values)
+            .returning(UserDB.uid)
+        )
+        result = await self.session.execute(statement)
+        updated = set(result.scalars())
         await self.session.commit()
-        await self.session.refresh(user)
+        return updated
 
-        return user
+    async def deactivate_many(
+        self, user_uids: Collection[UUID], modified_by: UUID
+    ) -> set[UUID]:
+        """Mark many users as inactive with a single UPDATE statement."""
+        statement = (
+            sa.update(UserDB.__table__)  # type: ignore
+            .where(UserDB.uid.in_(user_uids))  # type: ignore
+            .values(
+                is_active=False,
+                modified_by=modified_by,
+                date_modified=datetime.utcnow(),
+            )
+            .returning(UserDB.uid)
+        )
+        result = await self.session.execute(statement)
+        updated = set(result.scalars())
+        await self.session.commit()
+        return updated
 
     async def delete_user(self, user_uid: UUID) -> bool:
         """
@@ -0,0 +1,254 @@
+"""In process user repository module."""
+from bisect import bisect_right, insort
+from collections.abc import Collection, Iterator, Mapping, Sequence
+from datetime import datetime
+from typing import Any, Optional
+from uuid import UUID
+
+import orjson
+from sqlalchemy.exc import IntegrityError
+
+from app.api.v1.user_crud import PreconditionFailed, entity_tag
+from app.api.v1.user_repository import LoginCredentials, prepared_values
+from app.models.user import UserCreate, UserDB, UserRead, UserStats, UserUpdate
+
+COLUMNS: tuple[str, ...] = tuple(UserDB.__table__.c.keys())  # type: ignore
+READ_FIELDS: tuple[str, ...] = tuple(UserRead.__fields__)
+SEARCH_FIELDS = ("first_name", "last_name", "username", "email")
+
+Row = dict[str, Any]
+
+
+class InMemoryUserRepository:
+    """Users kept in process, a `UserRepository` that needs no database.
+
+    Rows are indexed by uid, username and email, and uids are kept sorted
+    for cursor pagination. Every method runs without awaiting between its
+    reads and writes, so it is atomic on the event loop.
+    """
+
+    def __init__(self) -> None:
+        """In memory user repository initializer."""
+        self._rows: dict[UUID, Row] = {}
+        self._by_username: dict[str, UUID] = {}
+        self._by_email: dict[str, UUID] = {}
+        self._unique = {"username": self._by_username, "email": self._by_email}
+        self._uids: list[UUID] = []
+
+    def load(self, rows: Sequence[Row]) -> None:
+        """Add rows of already prepared column values, eg. to seed a benchmark."""
+        for values in rows:
+            self._insert({column: values.get(column) for column in COLUMNS})
+
+    def clear(self) -> None:
+        """Remove all users."""
+        self._rows.clear()
+        self._by_username.clear()
+        self._by_email.clear()
+        self._uids.clear()
+
+    async def create_user(self, payload: UserCreate) -> UserDB:
+        """Create user."""
+        user = UserDB(**await prepared_values(payload.dict()))
+        self._insert({column: getattr(user, column) for column in COLUMNS})
+        return user
+
+    async def read_many_json(
+        self,
+        fields: Sequence[str] = (),
+        after: Optional[UUID] = None,
+        limit: Optional[int] = None,
+        is_active: Optional[bool] = None,
+        is_staff: Optional[bool] = None,
+    ) -> bytes:
+        """Read a page of users ordered by uid as `UserReadMany` json."""
+        rows = (
+            row
+            for row in self._after(after)
+            if (is_active is None or row["is_active"] is is_active)
+            and (is_staff is None or row["is_staff"] is is_staff)
+        )
+        return self._page_json(rows, fields, limit)
+
+    async def search_json(
+        self,
+        query: str,
+        limit: int,
+        fields: Sequence[str] = (),
+        after: Optional[UUID] = None,
+    ) -> bytes:
+        """Search users whose name, username or email starts with query."""
+        prefix = query.strip().lower()
+        rows = (
+            row
+            for row in self._after(after)
+            if any(row[field].startswith(prefix) for field in SEARCH_FIELDS)
+        )
+        return self._page_json(rows, fields, limit)
+
+    async def read_json_by_uid(
+        self,
+        user_uid: UUID,
+        fields: Sequence[str] = (),
+        if_none_match: Collection[str] = (),
+    ) -> Optional[tuple[str, Optional[bytes]]]:
+        """Read user by uid as `UserRead` json, with its entity tag."""
+        row = self._rows.get(user_uid)
+        if row is None:
+            return None
+        etag = entity_tag(user_uid, row["date_modified"], fields)
+        if etag in if_none_match or "*" in if_none_match:
+            return etag, None
+        values = {field: row[field] for field in fields or READ_FIELDS}
+        return etag, orjson.dumps(values)
+
+    async def read_by_uid(self, user_uid: UUID) -> Optional[UserDB]:
+        """Read user by uid."""
+        row = self._rows.get(user_uid)
+        return UserDB(**row) if row is not None else None
+
+    async def read_by_username(self, username: str) -> Optional[UserDB]:
+        """Read user by username."""
+        user_uid = self._by_username.get(username)
+        return await self.read_by_uid(user_uid) if user_uid is not None else None
+
+    async def exists(self, user_uid: UUID) -> bool:
+        """Check if user exists."""
+        return user_uid in self._rows
+
+    async def stats(self) -> UserStats:
+        """Count users, active, staff and superusers."""
+        rows = self._rows.values()
+        return UserStats(
+            total=len(rows),
+            active=sum(row["is_active"] for row in rows),
+            staff=sum(row["is_staff"] for row in rows),
+            superusers=sum(row["is_superuser"] for row in rows),
+        )
+
+    async def read_login_credentials(self, login: str) -> Optional[LoginCredentials]:
+        """Read login credentials of user by username or email."""
+        login = login.strip().lower()
+        user_uid = self._by_username.get(login)
+        if user_uid is None and "@" in login:
+            user_uid = self._by_email.get(login)
+        if user_uid is None:
+            return None
+        row = self._rows[user_uid]
+        return LoginCredentials(row["uid"], row["hashed_password"], row["is_active"])
+
+    async def update_user(
+        self,
+        user_uid: UUID,
+        payload: UserUpdate,
+        if_match: Optional[Collection[datetime]] = None,
+    ) -> Optional[UserDB]:
+        """Update user, `PreconditionFailed` when if_match is not met."""
+        values = await prepared_values(payload.dict(exclude_unset=True))
+        row = self._rows.get(user_uid)
+        if row is None:
+            return None
+        if if_match is not None and row["date_modified"] not in if_match:
+            raise PreconditionFailed()
+
+        self._check_unique({user_uid: values})
+        self._apply({user_uid: values})
+        return UserDB(**row)
+
+    async def bulk_update(
+        self, updates: Mapping[UUID, dict[str, Any]], modified_by: UUID
+    ) -> set[UUID]:
+        """Update many users, none of them when one update fails."""
+        found = {
+            user_uid: {k: v for k, v in values.items() if v is not None}
+            for user_uid, values in updates.items()
+            if user_uid in self._rows
+        }
+        self._check_unique(found)
+        for values in found.values():
+            values["modified_by"] = modified_by
+        self._apply(found)
+        return set(found)
+
+    async def deactivate_many(
+        self, user_uids: Collection[UUID], modified_by: UUID
+    ) -> set[UUID]:
+        """Mark many users as inactive."""
+        values = {"is_active": False, "modified_by": modified_by}
+        found = {user_uid for user_uid in user_uids if user_uid in self._rows}
+        self._apply({user_uid: values for user_uid in found})
+        return found
+
+    async def delete_user(self, user_uid: UUID) -> bool:
+        """Mark user as inactive."""
+        if user_uid not in self._rows:
+            return False
+        self._apply({user_uid: {"is_active": False}})
+        return True
+
+    def _insert(self, row: Row) -> None:
+        if row["uid"] in self._rows:
+            raise self._duplicate("uid")
+        for key, index in self._unique.items():
+            if row[key] in index:
+                raise self._duplicate(key)
+        self._rows[row["uid"]] = row
+        for key, index in self._unique.items():
+            index[row[key]] = row["uid"]
+        insort(self._uids, row["uid"])
+
+    def _check_unique(self, updates: Mapping[UUID, Row]) -> None:
+        for key, index in self._unique.items():
+            claimed = {
+                user_uid: values[key]
+                for user_uid, values in updates.items()
+                if values.get(key) is not None
+            }
+            if len(set(claimed.values())) < len(claimed):
+                raise self._duplicate(key)
+            # like a unique index, a value another user holds is taken.
+            if any(index.get(v, uid) != uid for uid, v in claimed.items()):
+                raise self._duplicate(key)
+
+    def _apply(self, updates: Mapping[UUID, Row]) -> None:
+        # old values are all unindexed before new ones are indexed.
+        for key, index in self._unique.items():
+            for user_uid, values in updates.items():
+                if key in values:
+                    del index[self._rows[user_uid][key]]
+            for user_uid, values in updates.items():
+                if key in values:
+                    index[values[key]] = user_uid
+        now = datetime.utcnow()
+        for user_uid, values in updates.items():
+            row = self._rows[user_uid]
+            row.update((k, v) for k, v in values.items() if k in COLUMNS)
+            row["uid"], row["date_modified"] = user_uid, now
+
+    def _after(self, after: Optional[UUID]) -> Iterator[Row]:
+        start = bisect_right(self._uids, after) if after is not None else 0
+        # consumed without awaiting, no row is added while iterating.
+        for i in range(start, len(self._uids)):
+            yield self._rows[self._uids[i]]
+
+    @staticmethod
+    def _page_json(
+        rows: Iterator[Row], fields: Sequence[str], limit: Optional[int]
+    ) -> bytes:
+        result = []
+        next_uid = None
+        for row in rows:
+            result.append({field: row[field] for field in fields or READ_FIELDS})
+            if limit is not None and len(result) == limit:
+                next_uid = row["uid"]
+                break
+        return orjson.dumps({"count": len(result), "result": result, "next": next_uid})
+
+    @staticmethod
+    def _duplicate(key: str) -> IntegrityError:
+        return IntegrityError(
+            "INSERT INTO auth_user", None, ValueError(f"duplicate {key}.")
+        )
+
+
+memory_users = InMemoryUserRepository()
@@ -0,0 +1,117 @@
+"""User repository interface module.
+
+Routes depend on `UserRepository` rather than on a storage backend:
+`UserCRUD` keeps users in postgres, `InMemoryUserRepository` in process.
+Repositories can wrap each other, eg. to add caching in front of one.
+"""
+from collections.abc import Collection, Mapping, Sequence
+from datetime import datetime
+from typing import Any, NamedTuple, Optional, Protocol
+from uuid import UUID
+
+from app.core import timing
+from app.models.user import UserCreate, UserDB, UserStats, UserUpdate
+from app.security import password
+
+
+class LoginCredentials(NamedTuple):
+    """Columns of a user needed to check a login."""
+
+    uid: UUID
+    hashed_password: str
+    is_active: bool
+
+
+class UserRepository(Protocol):
+    """Operations on users the api depends on."""
+
+    async def create_user(self, payload: UserCreate) -> UserDB:
+        """Create user, `IntegrityError` on a duplicate username or email."""
+
+    async def read_many_json(
+        self,
+        fields: Sequence[str] = (),
+        after: Optional[UUID] = None,
+        limit: Optional[int] = None,
+        is_active: Optional[bool] = None,
+        is_staff: Optional[bool] = None,
+    ) -> bytes:
+        """Read a page of users ordered by uid as `UserReadMany` json."""
+
+    async def search_json(
+        self,
+        query: str,
+        limit: int,
+        fields: Sequence[str] = (),
+        after: Optional[UUID] = None,
+    ) -> bytes:
+        """Search users whose name, username or email starts with query."""
+
+    async def read_json_by_uid(
+        self,
+        user_uid: UUID,
+        fields: Sequence[str] = (),
+        if_none_match: Collection[str] = (),
+    ) -> Optional[tuple[str, Optional[bytes]]]:
+        """Read user by uid as `UserRead` json, with its entity tag."""
+
+    async def read_by_uid(self, user_uid: UUID) -> Optional[UserDB]:
+        """Read user by uid."""
+
+    async def read_by_username(self, username: str) -> Optional[UserDB]:
+        """Read user by username."""
+
+    async def exists(self, user_uid: UUID) -> bool:
+        """Check if user exists."""
+
+    async def stats(self) -> UserStats:
+        """Count users, active, staff and superusers."""
+
+    async def read_login_credentials(self, login: str) -> Optional[LoginCredentials]:
+        """Read login credentials of user by username or email."""
+
+    async def update_user(
+        self,
+        user_uid: UUID,
+        payload: UserUpdate,
+        if_match: Optional[Collection[datetime]] = None,
+    ) -> Optional[UserDB]:
+        """Update user, `PreconditionFailed` when if_match is not met."""
+
+    async def bulk_update(
+        self, updates: Mapping[UUID, dict[str, Any]], modified_by: UUID
+    ) -> set[UUID]:
+        """Update many users at once, get the uids of those found.
+
+        Values of updates are prepared by `prepared_many` beforehand.
+        """
+
+    async def deactivate_many(
+        self, user_uids: Collection[UUID], modified_by: UUID
+    ) -> set[UUID]:
+        """Mark many users as inactive at once, get the uids of those found."""
+
+    async def delete_user(self, user_uid: UUID) -> bool:
+        """Mark user as inactive."""
+
+
+async def prepared_values(values: dict[str, Any]) -> dict[str, Any]:
+    """Hash the password and lowercase names, username and email of values."""
+    if values.get("password"):
+        with timing.phase("bcrypt-hash"):
+            values["hashed_password"] = await password.get_password_hash_async(
+                values["password"]
+            )
+    values.pop("password", None)
+    for key in ("first_name", "last_name", "username", "email"):
+        if values.get(key):
+            values[key] = values[key].strip().lower()
+    return values
+
+
+async def prepared_many(values: Sequence[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Prepare many values, hashing one password at a time.
+
+    Logins queued on the bcrypt pool meanwhile wait for one hash at most.
+    """
+    return [await prepared_values(v) for v in values]
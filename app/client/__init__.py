@@ -0,0 +1,4 @@
+"""Auth service client package, for services receiving its access tokens."""
+from app.client.verifier import InvalidToken, TokenVerifier
+
+__all__ = ("InvalidToken", "TokenVerifier")
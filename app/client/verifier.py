@@ -0,0 +1,176 @@
+"""Access token verifier module.
+
+`TokenVerifier` checks tokens issued by this service in the service that
+receives them, without a request per token: the json web key set is
+fetched once, revalidated with its ETag when it expires and refetched
+early only for a `kid` it does not know. Verified tokens are cached for a
+short while, so a client reusing a token skips the signature check.
+"""
+import asyncio
+import json
+from collections import OrderedDict
+from collections.abc import Sequence
+from time import monotonic, time
+from typing import Any, Optional
+
+import httpx
+import jwt  # type: ignore
+from fastapi import Header, HTTPException, status
+from jwt.algorithms import RSAAlgorithm  # type: ignore
+
+Claims = dict[str, Any]
+
+# an unknown `kid` refetches the keys at most this often.
+MIN_REFRESH_INTERVAL = 10.0
+
+
+class InvalidToken(Exception):
+    """The token is malformed, not an access token or not signed by a key."""
+
+
+class TokenVerifier:
+    """Verify access tokens against the keys served by the auth service."""
+
+    def __init__(
+        self,
+        base_url: str,
+        client: Optional[httpx.AsyncClient] = None,
+        algorithms: Sequence[str] = ("RS256",),
+        keys_ttl: float = 300.0,
+        token_cache_size: int = 10_000,
+        token_cache_ttl: float = 60.0,
+    ) -> None:
+        """Token verifier initializer, base_url is the auth api v1 url."""
+        self.jwks_url = f"{base_url.rstrip('/')}/public-key/jwks"
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(timeout=5.0)
+        self.algorithms = list(algorithms)
+        self.keys_ttl = keys_ttl
+        self.token_cache_size = token_cache_size
+        self.token_cache_ttl = token_cache_ttl
+        self.fetches = self.revalidations = 0
+        self._keys: dict[str, Any] = {}
+        self._etag: Optional[str] = None
+        self._keys_expire_at = 0.0
+        self._refreshed_at = -MIN_REFRESH_INTERVAL
+        self._lock: Optional[asyncio.Lock] = None
+        self._tokens: OrderedDict[str, tuple[Claims, float]] = OrderedDict()
+
+    async def aclose(self) -> None:
+        """Close the http client, unless it was passed in."""
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def refresh_keys(self, force: bool = False) -> None:
+        """Revalidate the keys once expired, or now with force."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # another caller may have refreshed them while this one waited.
+            if force:
+                if monotonic() - self._refreshed_at < MIN_REFRESH_INTERVAL:
+                    return
+            elif monotonic() < self._keys_expire_at:
+                return
+
+            headers = {"If-None-Match": self._etag} if self._etag else {}
+            response = await self.client.get(self.jwks_url, headers=headers)
+            if response.status_code == status.HTTP_304_NOT_MODIFIED:
+                self.revalidations += 1
+            else:
+                response.raise_for_status()
+                keys = {
+                    jwk["kid"]: RSAAlgorithm.from_jwk(json.dumps(jwk))
+                    for jwk in response.json()["keys"]
+                }
+                # tokens verified with a key that was rotated out are not valid.
+                if keys.keys() != self._keys.keys():
+                    self._tokens.clear()
+                self._keys = keys
+                self._etag = response.headers.get("ETag")
+                self.fetches += 1
+            self._refreshed_at = monotonic()
+            self._keys_expire_at = self._refreshed_at + self.keys_ttl
+
+    async def verify(self, token: str) -> Claims:
+        """Get the claims of a valid access token, `InvalidToken` otherwise."""
+        cached = self._tokens.get(token)
+        if cached is not None and cached[1] > time():
+            self._tokens.move_to_end(token)
+            return cached[0]
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError as e:
+            raise InvalidToken(str(e)) from e
+        key = await self._key(header.get("kid"))
+        try:
+            claims = jwt.decode(token, key, algorithms=self.algorithms)
+        except jwt.InvalidTokenError as e:
+            raise InvalidToken(str(e)) from e
+        if claims.get("type") != "access":
+            raise InvalidToken("not an access token.")
+
+        expires_at = time() + self.token_cache_ttl
+        if "exp" in claims:
+            expires_at = min(expires_at, claims["exp"])
+        self._tokens[token] = (claims, expires_at)
+        if len(self._tokens) > self.token_cache_size:
+            self._tokens.popitem(last=False)
+        return claims
+
+    async def _key(self, kid: Optional[str]) -> Any:
+        if monotonic() >= self._keys_expire_at:
+            await self.refresh_keys()
+        if kid is None:
+            # tokens issued before keys were named, there is one key then.
+            if len(self._keys) == 1:
+                return next(iter(self._keys.values()))
+            raise InvalidToken("token has no key id.")
+        if kid not in self._keys:
+            await self.refresh_keys(force=True)
+        if kid not in self._keys:
+            raise InvalidToken("unknown key id.")
+        return self._keys[kid]
+
+    async def claims(
+        self, authorization: Optional[str] = Header(default=None)
+    ) -> Claims:
+        """Dependency that gets the claims of the request bearer token."""
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="missing bearer token.",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        try:
+            return await self.verify(token)
+        except InvalidToken:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="invalid token.",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        except httpx.HTTPError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="token keys unavailable, retry later.",
+                headers={"Retry-After": "1"},
+            )
+
+    async def superuser(
+        self, authorization: Optional[str] = Header(default=None)
+    ) -> Claims:
+        """Dependency that allows active superusers only, and gets their claims."""
+        claims = await self.claims(authorization)
+        if not claims.get("is_superuser"):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="insufficient privileges.",
+            )
+        if not claims.get("is_active"):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="inactive user."
+            )
+        return claims
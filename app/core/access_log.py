@@ -0,0 +1,216 @@
+"""Structured access and audit log module.
+
+Every request gets one json record with its request id, route template,
+status, latency and the subject of its access token. Records are put on
+a bounded queue and formatted and written by a listener thread, the event
+loop never waits on the log stream: when the queue is full the record is
+dropped and counted. Successful reads can be sampled, errors and writes
+are always logged. Only the shape of a request is logged, never headers,
+query strings or bodies, so tokens and login credentials stay out of it.
+"""
+import json
+import logging
+import queue
+import random
+import re
+import sys
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from time import perf_counter
+from typing import Any, Optional, TextIO
+from uuid import uuid4
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import registry, route_template
+from app.core.settings import settings
+
+REQUEST_ID_HEADER = "X-Request-ID"
+REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+REDACTED_KEYS = frozenset(
+    ("password", "hashed_password", "token", "access_token", "authorization")
+)
+
+_request: ContextVar[Optional[dict[str, Any]]] = ContextVar("request", default=None)
+
+
+def set_subject(subject: Optional[str]) -> None:
+    """Record the token subject of the request being logged."""
+    fields = _request.get()
+    if fields is not None:
+        fields["subject"] = subject
+
+
+def request_id() -> Optional[str]:
+    """Get id of the request being logged."""
+    fields = _request.get()
+    return fields["request_id"] if fields is not None else None
+
+
+def redact(fields: dict[str, Any]) -> dict[str, Any]:
+    """Replace values of credential looking keys."""
+    return {k: "[redacted]" if k in REDACTED_KEYS else v for k, v in fields.items()}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records whose message is a dict as one json line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format record."""
+        fields: dict[str, Any]
+        if isinstance(record.msg, dict):
+            fields = record.msg
+        else:
+            fields = {"message": record.getMessage()}
+        record_fields = {"ts": round(record.created, 6), "level": record.levelname}
+        return json.dumps({**record_fields, **redact(fields)}, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records on a full queue instead of failing."""
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        """Dropping queue handler initializer."""
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Leave formatting of the record to the listener thread."""
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Queue record, or drop it when the queue is full."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    # the `QueueListener` one, missing from its stubs.
+    _sentinel = None
+
+    def enqueue_sentinel(self) -> None:
+        # the queue may be full, wait for the thread to make room.
+        self.queue.put(self._sentinel)
+
+
+class AccessLog:
+    """Write access records from a listener thread.
+
+    Records are dropped while the log is not started, eg. in tests.
+    """
+
+    def __init__(self, max_queue: int, sample_rate: float) -> None:
+        """Access log initializer."""
+        self.sample_rate = sample_rate
+        self.sampled_out = 0
+        self.logger = logging.getLogger("zaer.access")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self._handler = DroppingQueueHandler(queue.Queue(max_queue))
+        self._listener: Optional[_Listener] = None
+
+    @property
+    def dropped(self) -> int:
+        """Get number of records dropped on a full queue."""
+        return self._handler.dropped
+
+    @property
+    def pending(self) -> int:
+        """Get number of queued records."""
+        return self._handler.queue.qsize()  # type: ignore
+
+    def start(self, stream: Optional[TextIO] = None) -> None:
+        """Start the listener thread writing to stream, stderr by default."""
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(JsonFormatter())
+        self._listener = _Listener(self._handler.queue, handler)
+        self._listener.start()
+        self.logger.addHandler(self._handler)
+
+    def stop(self) -> None:
+        """Write queued records and stop the listener thread."""
+        if self._listener is None:
+            return
+        self.logger.removeHandler(self._handler)
+        self._listener.stop()
+        self._listener = None
+
+    def log(self, fields: dict[str, Any]) -> None:
+        """Queue a record, successful reads are sampled."""
+        if self._listener is None:
+            return
+        sampled = fields.get("method") in READ_METHODS and fields["status"] < 400
+        if sampled and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        self.logger.info(fields)
+
+
+access_log = AccessLog(
+    max_queue=settings.access_log_max_queue,
+    sample_rate=settings.access_log_sample_rate,
+)
+
+registry.callback(
+    "zaer_access_log_records_total",
+    "Access log records dropped on a full queue or left out by sampling.",
+    ("outcome",),
+    "counter",
+    lambda: {
+        ("dropped",): access_log.dropped,
+        ("sampled_out",): access_log.sampled_out,
+    },
+)
+
+
+class AccessLogMiddleware:
+    """Log every http request and echo its id in an `X-Request-ID` header."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Access log middleware initializer."""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle ASGI call."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        given = Headers(scope=scope).get(REQUEST_ID_HEADER, "")
+        fields: dict[str, Any] = {
+            "event": "access",
+            "request_id": given if REQUEST_ID.match(given) else uuid4().hex,
+            "subject": None,
+        }
+        token = _request.set(fields)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append(
+                    REQUEST_ID_HEADER, fields["request_id"]
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request.reset(token)
+            client = scope.get("client")
+            access_log.log(
+                {
+                    **fields,
+                    "method": scope["method"],
+                    "route": route_template(scope),
+                    "status": status_code,
+                    "ms": round((perf_counter() - start) * 1000, 2),
+                    "client": client[0] if client else None,
+                }
+            )
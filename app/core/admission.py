@@ -0,0 +1,195 @@
+"""Admission control and load shedding module."""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request, status
+
+from app.core.metrics import registry
+from app.core.settings import settings
+
+
+@dataclass
+class AdmissionStats:
+    """Counters describing how requests went through a limiter."""
+
+    admitted: int = 0
+    queued: int = 0
+    shed: int = 0
+
+
+class ConcurrencyLimiter:
+    """Limit concurrent executions of a CPU heavy section.
+
+    Requests that find every slot busy wait in a bounded FIFO queue. A
+    request is shed with `503` and a `Retry-After` header when the queue
+    is full or when it could not get a slot before the queue timeout.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+    ) -> None:
+        """Concurrency limiter initializer."""
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.stats = AdmissionStats()
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        """Get number of requests waiting for a slot."""
+        return len(self._waiters)
+
+    def _overloaded(self) -> HTTPException:
+        self.stats.shed += 1
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="server busy, retry later.",
+            headers={"Retry-After": str(max(1, math.ceil(self.queue_timeout)))},
+        )
+
+    async def _acquire(self) -> None:
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._overloaded()
+
+        self.stats.queued += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+        if not waiter.done():
+            waiter.cancel()
+            raise self._overloaded()
+
+    def _release(self) -> None:
+        # hand the slot over to the oldest live waiter, in_flight is unchanged.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one execution slot for the duration of the block."""
+        await self._acquire()
+        self.stats.admitted += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+
+class TokenBucketThrottle:
+    """In-memory token buckets keyed by an arbitrary string.
+
+    The least recently used keys are evicted once `max_keys` is reached so
+    that a flood of distinct keys cannot grow memory without bounds.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 10_000) -> None:
+        """Token bucket throttle initializer."""
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.throttled = 0
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def hit(self, key: str) -> float:
+        """Take one token for key.
+
+        Returns zero when the token was granted, otherwise the number of
+        seconds until a token becomes available.
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        retry_after = 0.0
+        if tokens >= 1.0:
+            tokens -= 1.0
+        else:
+            self.throttled += 1
+            retry_after = (1.0 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+login_limiter = ConcurrencyLimiter(
+    name="login",
+    max_concurrency=settings.login_max_concurrency,
+    max_queue=settings.login_max_queue,
+    queue_timeout=settings.login_queue_timeout,
+)
+login_ip_throttle = TokenBucketThrottle(
+    rate=settings.login_ip_rate, burst=settings.login_ip_burst
+)
+login_username_throttle = TokenBucketThrottle(
+    rate=settings.login_username_rate, burst=settings.login_username_burst
+)
+
+registry.callback(
+    "zaer_admission_requests_total",
+    "Requests admitted, queued, shed or throttled by admission control.",
+    ("limiter", "outcome"),
+    "counter",
+    lambda: {
+        ("login", "admitted"): login_limiter.stats.admitted,
+        ("login", "queued"): login_limiter.stats.queued,
+        ("login", "shed"): login_limiter.stats.shed,
+        ("login", "throttled_ip"): login_ip_throttle.throttled,
+        ("login", "throttled_username"): login_username_throttle.throttled,
+    },
+)
+registry.callback(
+    "zaer_admission_requests",
+    "Requests currently running or waiting in admission control.",
+    ("limiter", "state"),
+    "gauge",
+    lambda: {
+        ("login", "in_flight"): login_limiter.in_flight,
+        ("login", "waiting"): login_limiter.waiting,
+    },
+)
+
+
+def throttle_or_error(throttle: TokenBucketThrottle, key: str) -> None:
+    """Raise `429` with `Retry-After` when key ran out of tokens."""
+    retry_after = throttle.hit(key)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="too many login attempts, retry later.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def client_ip(request: Request) -> str:
+    """Get client ip address of the request."""
+    return request.client.host if request.client else "unknown"
@@ -0,0 +1,121 @@
+"""Traffic shape capture module.
+
+Records the shape of every request, never its content: the route
+template instead of the concrete path, method, status, latency and body
+sizes. Headers, query strings, path parameters and bodies are not looked
+at, so tokens and credentials cannot end up in the trace. The trace is
+the input of `benchmarks.replay`.
+"""
+import atexit
+import json
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import route_template
+
+
+class TraceWriter:
+    """Buffer trace records and append them to a jsonl file in batches.
+
+    Full batches are appended by a writer thread, off the event loop. They
+    are dropped while the thread is `max_batches` behind.
+    """
+
+    def __init__(
+        self, path: str, batch_size: int = 100, max_batches: int = 100
+    ) -> None:
+        """Trace writer initializer."""
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._buffer: list[dict[str, Any]] = []
+        self._batches: queue.Queue[list[dict[str, Any]]] = queue.Queue(max_batches)
+        threading.Thread(target=self._run, daemon=True).start()
+        atexit.register(self.flush)
+
+    def write(self, record: dict[str, Any]) -> None:
+        """Add record, the buffer goes to the writer thread once it holds a batch."""
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            records, self._buffer = self._buffer, []
+            try:
+                self._batches.put_nowait(records)
+            except queue.Full:
+                self.dropped += len(records)
+
+    def flush(self) -> None:
+        """Append buffered records and wait for the writer thread, at shutdown."""
+        records, self._buffer = self._buffer, []
+        if records:
+            self._batches.put(records)
+        self._batches.join()
+
+    def _run(self) -> None:
+        while True:
+            records = self._batches.get()
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a") as f:
+                    f.writelines(json.dumps(r) + "\n" for r in records)
+            except OSError:
+                self.dropped += len(records)
+            finally:
+                self._batches.task_done()
+
+
+class TrafficCaptureMiddleware:
+    """Record sanitized request shapes to a trace file."""
+
+    def __init__(self, app: ASGIApp, path: str, sample_rate: float = 1.0) -> None:
+        """Traffic capture middleware initializer."""
+        self.app = app
+        self.sample_rate = sample_rate
+        self.writer = TraceWriter(path)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle ASGI call."""
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        timestamp = time.time()
+        start = perf_counter()
+        request_size = response_size = 0
+        status_code = 500
+
+        async def receive_wrapper() -> Message:
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                request_size += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_size, status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            self.writer.write(
+                {
+                    "ts": round(timestamp, 6),
+                    "method": scope["method"],
+                    "route": route_template(scope),
+                    "status": status_code,
+                    "duration_ms": round((perf_counter() - start) * 1000, 3),
+                    "request_bytes": request_size,
+                    "response_bytes": response_size,
+                }
+            )
@@ -1,12 +1,21 @@
 """Database engine and session creation module."""
-from collections.abc import AsyncGenerator
+import asyncio
+import math
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from contextvars import ContextVar
 from operator import attrgetter
-from sys import modules
+from time import monotonic, perf_counter
+from typing import Optional
 
+from fastapi import HTTPException, status
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core import metrics, query_log, timing
 from app.core.settings import settings
 
 user, password, db, host, port, test_db, test_port = attrgetter(
@@ -19,13 +28,192 @@ user, password, db, host, port, test_db, test_port = attrgetter(
     "pg_test_port",
 )(settings)
 db_connection_str = f"postgresql+asyncpg://{user}:{password}@{host}:{port}/{db}"
-if "pytest" in modules:
+if settings.pg_use_test_db:
     db_connection_str = (
         f"postgresql+asyncpg://{user}:{password}@{host}:{test_port}/{test_db}"
     )
 
 
-async_engine = create_async_engine(db_connection_str, echo=False, future=True)
+# command_timeout cancels a statement client side, statement_timeout server
+# side, both bound statements of requests whose client has long given up.
+async_engine = create_async_engine(
+    db_connection_str,
+    echo=False,
+    future=True,
+    pool_timeout=settings.db_pool_timeout,
+    connect_args={
+        "command_timeout": settings.db_command_timeout,
+        "server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)},
+    },
+)
+
+# sqlstates of failures caused by the database rather than the statement:
+# query canceled, admin or crash shutdown and connection exceptions.
+UNAVAILABLE_SQLSTATES = ("57014", "57P01", "57P02", "57P03", "08")
+
+
+def is_unavailable(exc: BaseException) -> bool:
+    """Check if an error means the database is unreachable, down or too slow."""
+    for error in (exc, getattr(exc, "orig", None), exc.__cause__):
+        if isinstance(error, (OSError, asyncio.TimeoutError, PoolTimeoutError)):
+            return True
+        sqlstate = getattr(error, "sqlstate", None)
+        if sqlstate and sqlstate.startswith(UNAVAILABLE_SQLSTATES):
+            return True
+    return False
+
+
+class CircuitBreaker:
+    """Fail fast with `503` while the database keeps failing.
+
+    Closed, requests pass until `failure_threshold` consecutive failures
+    open the circuit. Open, requests are rejected for `reset_timeout`
+    seconds. Half open, `half_open_max` probe requests pass, a success
+    closes the circuit and a failure opens it again.
+    """
+
+    def __init__(
+        self, failure_threshold: int, reset_timeout: float, half_open_max: int
+    ) -> None:
+        """Circuit breaker initializer."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.failures = 0
+        self.rejected = 0
+        self.opened_at: Optional[float] = None
+        self._probes = 0
+        self._last_probe = 0.0
+
+    @property
+    def state(self) -> str:
+        """Get circuit state, closed, open or half_open."""
+        if self.opened_at is None:
+            return "closed"
+        if monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def check(self) -> None:
+        """Raise `503` with `Retry-After` unless a request may use the database."""
+        state = self.state
+        if state == "closed":
+            return
+        now = monotonic()
+        # a probe that never reached the database must not block recovery.
+        if state == "half_open" and (
+            self._probes < self.half_open_max
+            or now - self._last_probe >= self.reset_timeout
+        ):
+            self._probes += 1
+            self._last_probe = now
+            return
+        self.rejected += 1
+        retry_after = self.reset_timeout
+        if state == "open":
+            retry_after -= now - self.opened_at  # type: ignore
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="database unavailable, retry later.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def success(self) -> None:
+        """Record a successful statement, closing the circuit."""
+        self.failures = 0
+        self.opened_at = None
+        self._probes = 0
+
+    def failure(self) -> None:
+        """Record a database failure, opening the circuit at the threshold."""
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = monotonic()
+            self._probes = 0
+
+
+db_breaker = CircuitBreaker(
+    failure_threshold=settings.db_breaker_failure_threshold,
+    reset_timeout=settings.db_breaker_reset_timeout,
+    half_open_max=settings.db_breaker_half_open_max,
+)
+
+metrics.registry.callback(
+    "zaer_db_circuit_state",
+    "Database circuit breaker state, 1 for the current one.",
+    ("state",),
+    "gauge",
+    lambda: {
+        (state,): float(db_breaker.state == state)
+        for state in ("closed", "open", "half_open")
+    },
+)
+metrics.registry.callback(
+    "zaer_db_circuit_rejected_total",
+    "Requests rejected by the open database circuit breaker.",
+    (),
+    "counter",
+    lambda: {(): db_breaker.rejected},
+)
+
+# monotonic time by which statements of the current request must finish.
+_deadline: ContextVar[Optional[float]] = ContextVar("db_deadline", default=None)
+
+
+def deadline(seconds: float) -> Callable[[], AsyncIterator[None]]:
+    """Create a route dependency bounding its statements to `seconds`."""
+
+    async def set_deadline() -> AsyncIterator[None]:
+        token = _deadline.set(monotonic() + seconds)
+        try:
+            yield
+        finally:
+            _deadline.reset(token)
+
+    return set_deadline
+
+
+def statement_kind(statement: str) -> str:
+    """Get the leading keyword of a sql statement, eg. SELECT."""
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else ""
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Remember statement start time."""
+    context._query_start_time = perf_counter()
+
+
+@event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Record statement duration."""
+    elapsed = perf_counter() - context._query_start_time
+    kind = statement_kind(statement)
+    metrics.DB_QUERY_SECONDS.observe(elapsed, kind)
+    timing.record("sql", elapsed, kind)
+    db_breaker.success()
+    # session settings, eg. the deadline, are not queries of the route.
+    if kind != "SET":
+        query_log.observe(statement, parameters, elapsed)
+
+
+@event.listens_for(async_engine.sync_engine, "handle_error")
+def handle_error(context) -> None:
+    """Count failures caused by the database towards the circuit breaker."""
+    if context.is_disconnect or is_unavailable(context.original_exception):
+        db_breaker.failure()
+
+
+@event.listens_for(async_engine.sync_engine, "begin")
+def set_statement_timeout(conn) -> None:
+    """Bound statements of the transaction by the request deadline."""
+    deadline_at = _deadline.get()
+    if deadline_at is None:
+        return
+    timeout_ms = max(1, int((deadline_at - monotonic()) * 1000))
+    if timeout_ms < settings.db_statement_timeout_ms:
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
@@ -33,5 +221,21 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async_session = sessionmaker(
         bind=async_engine, class_=AsyncSession, expire_on_commit=False
     )
+    db_breaker.check()
     async with async_session() as session:
+        # check out the pooled connection up front to measure the wait for it.
+        try:
+            with metrics.DB_POOL_CHECKOUT_SECONDS.time(), timing.phase("db-session"):
+                await session.connection()
+        except (SQLAlchemyError, OSError) as e:
+            if not is_unavailable(e):
+                raise
+            # pool timeouts are not seen by handle_error.
+            if isinstance(e, PoolTimeoutError):
+                db_breaker.failure()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="database unavailable, retry later.",
+                headers={"Retry-After": "1"},
+            )
         yield session
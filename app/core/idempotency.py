@@ -0,0 +1,247 @@
+"""Idempotency key handling module.
+
+A client sending an `Idempotency-Key` header gets the stored response of
+the first request with that key on every retry, the request is not run
+again. Keys are claimed with a single INSERT ... ON CONFLICT before the
+request runs, so concurrent retries cannot both run it. A claim left
+unfinished for `idempotency_lease_seconds`, by a worker that died while
+running the request, is taken over by the next retry. Finished
+responses are also kept in an in-process LRU in front of the table.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from uuid import UUID
+
+import orjson
+import sqlalchemy as sa
+from fastapi import HTTPException, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.settings import settings
+from app.models.idempotency import IdempotencyKeyDB
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL = 60 * 60.0
+
+CacheKey = tuple[UUID, str]
+
+
+@dataclass
+class StoredResponse:
+    """Response stored for an idempotency key, status unset while in progress."""
+
+    fingerprint: str
+    status_code: Optional[int]
+    body: bytes
+    created_at: datetime
+
+
+class ResponseCache:
+    """Least recently used cache of finished responses."""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        """Response cache initializer."""
+        self.max_size = max_size
+        self.ttl = timedelta(seconds=ttl)
+        self._responses: OrderedDict[CacheKey, StoredResponse] = OrderedDict()
+
+    def get(self, key: CacheKey) -> Optional[StoredResponse]:
+        """Get response of key unless it expired."""
+        stored = self._responses.get(key)
+        if stored is None:
+            return None
+        if stored.created_at < datetime.utcnow() - self.ttl:
+            del self._responses[key]
+            return None
+        self._responses.move_to_end(key)
+        return stored
+
+    def put(self, key: CacheKey, stored: StoredResponse) -> None:
+        """Add response of key, evicting the least recently used one."""
+        self._responses[key] = stored
+        self._responses.move_to_end(key)
+        if len(self._responses) > self.max_size:
+            self._responses.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all responses."""
+        self._responses.clear()
+
+
+response_cache = ResponseCache(
+    settings.idempotency_cache_size, settings.idempotency_ttl_seconds
+)
+
+
+def request_fingerprint(method: str, path: str, payload: Any) -> str:
+    """Get fingerprint of a request, to detect a key reused for another one."""
+    message = orjson.dumps([method, path, payload], option=orjson.OPT_SORT_KEYS)
+    # keyed, payloads may hold passwords and fingerprints are stored.
+    secret = settings.idempotency_secret.encode()
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()
+
+
+class IdempotencyKeys:
+    """Claim idempotency keys and store the response of their request."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        """Idempotency keys class initializer."""
+        self.session = session
+
+    async def run(
+        self,
+        subject: UUID,
+        key: str,
+        fingerprint: str,
+        handler: Callable[[], Awaitable[Response]],
+    ) -> Response:
+        """
+        Run handler once per key and get its response, stored on retries.
+
+        A `4xx` error raised by handler is stored like a response. On any
+        other failure the key is released, so the request can be retried.
+        """
+        stored = response_cache.get((subject, key))
+        if stored is None:
+            stored = await self._claim(subject, key, fingerprint)
+        if stored is not None:
+            return replay(stored, fingerprint)
+
+        try:
+            response = await handler()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                await self._release(subject, key)
+                raise
+            response = JSONResponse(
+                {"detail": e.detail}, status_code=e.status_code, headers=e.headers
+            )
+        except BaseException:
+            await self._release(subject, key)
+            raise
+        await self._complete(subject, key, fingerprint, response)
+        return response
+
+    async def _claim(
+        self, subject: UUID, key: str, fingerprint: str
+    ) -> Optional[StoredResponse]:
+        now = datetime.utcnow()
+        expired = now - timedelta(seconds=settings.idempotency_ttl_seconds)
+        abandoned = now - timedelta(seconds=settings.idempotency_lease_seconds)
+        table = IdempotencyKeyDB.__table__  # type: ignore
+        statement = insert(table).values(  # type: ignore
+            subject=subject, key=key, fingerprint=fingerprint, created_at=now
+        )
+        # take over an expired or abandoned key, otherwise keep the existing row.
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.subject, table.c.key],  # type: ignore
+            set_=dict(
+                fingerprint=fingerprint,
+                status_code=None,
+                response_body=None,
+                created_at=now,
+            ),
+            where=sa.or_(
+                table.c.created_at < expired,  # type: ignore
+                sa.and_(
+                    table.c.status_code.is_(None),  # type: ignore
+                    table.c.created_at < abandoned,  # type: ignore
+                ),
+            ),
+        )
+        statement = statement.returning(table.c.key)  # type: ignore
+        result = await self.session.execute(statement)
+        claimed = result.first() is not None
+        await self.session.commit()
+        if claimed:
+            return None
+
+        result = await self.session.execute(
+            sa.select(IdempotencyKeyDB.__table__).where(  # type: ignore
+                IdempotencyKeyDB.subject == subject, IdempotencyKeyDB.key == key
+            )
+        )
+        row = result.one()
+        return StoredResponse(
+            row.fingerprint, row.status_code, row.response_body or b"", row.created_at
+        )
+
+    async def _complete(
+        self, subject: UUID, key: str, fingerprint: str, response: Response
+    ) -> None:
+        # drop what a failed handler left in the session transaction.
+        await self.session.rollback()
+        await self.session.execute(
+            sa.update(IdempotencyKeyDB.__table__)  # type: ignore
+            .where(IdempotencyKeyDB.subject == subject, IdempotencyKeyDB.key == key)
+            .values(status_code=response.status_code, response_body=response.body)
+        )
+        await self.session.commit()
+        response_cache.put(
+            (subject, key),
+            StoredResponse(
+                fingerprint, response.status_code, response.body, datetime.utcnow()
+            ),
+        )
+
+    async def _release(self, subject: UUID, key: str) -> None:
+        await self.session.rollback()
+        await self.session.execute(
+            sa.delete(IdempotencyKeyDB.__table__).where(  # type: ignore
+                IdempotencyKeyDB.subject == subject, IdempotencyKeyDB.key == key
+            )
+        )
+        await self.session.commit()
+
+
+def replay(stored: StoredResponse, fingerprint: str) -> Response:
+    """Get the stored response, when it was stored for the same request."""
+    if not hmac.compare_digest(stored.fingerprint, fingerprint):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="idempotency key already used for a different request.",
+        )
+    if stored.status_code is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="request with this idempotency key is in progress.",
+            headers={"Retry-After": "1"},
+        )
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def purge_expired(engine: AsyncEngine) -> None:
+    """Delete expired idempotency keys every `PURGE_INTERVAL` seconds."""
+    while True:
+        expired = datetime.utcnow() - timedelta(
+            seconds=settings.idempotency_ttl_seconds
+        )
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(
+                    sa.delete(IdempotencyKeyDB.__table__).where(  # type: ignore
+                        IdempotencyKeyDB.created_at < expired
+                    )
+                )
+        except (SQLAlchemyError, OSError) as e:
+            message = {"event": "idempotency_purge_failed", "error": str(e)}
+            logger.warning(json.dumps(message))
+        await asyncio.sleep(PURGE_INTERVAL)
@@ -0,0 +1,188 @@
+"""Application warm-up, readiness and graceful drain module."""
+import asyncio
+import json
+import logging
+from time import monotonic
+from typing import Optional
+
+from fastapi_jwt_auth import AuthJWT  # type: ignore
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.db import async_engine, db_breaker
+from app.core.settings import settings
+from app.security import password
+
+logger = logging.getLogger(__name__)
+
+PROBE_PATHS = ("/livez", "/readyz")
+
+
+async def warm_up(engine: AsyncEngine, connections: int) -> None:
+    """Open pool connections and run the first sign, verify and bcrypt calls."""
+    start = monotonic()
+
+    async def ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # held concurrently, so the pool really opens `connections` of them.
+    try:
+        await asyncio.gather(*(ping() for _ in range(connections)))
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning(json.dumps({"event": "warm_up_db_failed", "error": str(e)}))
+
+    authorize = AuthJWT()
+    token = authorize.create_access_token(subject="warm-up")
+    authorize.get_raw_jwt(encoded_token=token)
+    hashed = await password.get_password_hash_async("warm-up")
+    await password.verify_password_async("warm-up", hashed)
+    logger.info(
+        json.dumps({"event": "warm_up", "ms": round((monotonic() - start) * 1000, 2)})
+    )
+
+
+class ReadinessProbe:
+    """Check that the app is warmed up and its database answers.
+
+    The database ping result is cached for `cache_seconds` and concurrent
+    checks share one ping, so probes cannot add load to a struggling
+    database. Without `database_required`, eg. with in process users, the
+    database is not checked.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        cache_seconds: float,
+        timeout: float,
+        database_required: bool = True,
+    ) -> None:
+        """Readiness probe initializer."""
+        self.engine = engine
+        self.database_required = database_required
+        self.cache_seconds = cache_seconds
+        self.timeout = timeout
+        self.warmed_up = False
+        self._checked_at = -cache_seconds
+        self._database_ok = False
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def check(self) -> dict[str, bool]:
+        """Get readiness of each component."""
+        return {
+            "warmed_up": self.warmed_up,
+            "draining": drain.draining,
+            "database": await self._database(),
+        }
+
+    async def _database(self) -> bool:
+        if not self.database_required:
+            return True
+        if db_breaker.state == "open":
+            return False
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if monotonic() - self._checked_at >= self.cache_seconds:
+                self._database_ok = await self._ping()
+                self._checked_at = monotonic()
+        return self._database_ok
+
+    async def _ping(self) -> bool:
+        try:
+            async with self.engine.connect() as conn:
+                await asyncio.wait_for(
+                    conn.execute(text("SELECT 1")), timeout=self.timeout
+                )
+        except (SQLAlchemyError, OSError, asyncio.TimeoutError):
+            return False
+        return True
+
+
+class Drain:
+    """Track in-flight requests, to finish them before shutting down."""
+
+    def __init__(self) -> None:
+        """Drain initializer."""
+        self.in_flight = 0
+        self.draining = False
+        self._idle: Optional[asyncio.Event] = None
+
+    def enter(self) -> None:
+        """Count a started request."""
+        self.in_flight += 1
+
+    def exit(self) -> None:
+        """Count a finished request."""
+        self.in_flight -= 1
+        if self.in_flight == 0 and self._idle is not None:
+            self._idle.set()
+
+    def start(self) -> None:
+        """Fail readiness and stop admitting requests."""
+        if not self.draining:
+            message = {"event": "drain_started", "in_flight": self.in_flight}
+            logger.info(json.dumps(message))
+        self.draining = True
+
+    async def wait(self, timeout: float) -> bool:
+        """Stop admitting requests and wait for in-flight ones to finish."""
+        self.start()
+        if self.in_flight == 0:
+            return True
+        self._idle = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                json.dumps({"event": "drain_timeout", "in_flight": self.in_flight})
+            )
+            return False
+        return True
+
+
+drain = Drain()
+readiness = ReadinessProbe(
+    async_engine,
+    cache_seconds=settings.readiness_cache_seconds,
+    timeout=settings.readiness_timeout,
+    database_required=settings.user_backend == "postgres",
+)
+
+
+class DrainMiddleware:
+    """Count in-flight requests and reject new ones with `503` while draining."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Drain middleware initializer."""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle ASGI call."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if drain.draining and scope["path"] not in PROBE_PATHS:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 503,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"connection", b"close"),
+                        (b"retry-after", b"1"),
+                    ],
+                }
+            )
+            await send(
+                {"type": "http.response.body", "body": b'{"detail":"shutting down."}'}
+            )
+            return
+        drain.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            drain.exit()
@@ -0,0 +1,232 @@
+"""Login audit events module.
+
+Login attempts are queued in process and written by a background task in
+multi-row INSERT batches, so `login` never waits on the audit write. The
+`login_event` table is range partitioned by month: partitions are created
+ahead of time and old ones are dropped whole instead of deleting rows.
+"""
+import asyncio
+import json
+import logging
+import re
+from contextlib import suppress
+from datetime import date, datetime
+from typing import Any, Optional
+from uuid import UUID
+
+import sqlalchemy as sa
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.db import async_engine
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.models.login_event import LoginEventDB
+from app.utils.uuid7 import uuid7
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r"^login_event_y(\d{4})m(\d{2})$")
+MAINTENANCE_INTERVAL = 24 * 60 * 60.0
+
+
+def add_months(month: date, months: int) -> date:
+    """Get the first day of the month `months` after the month of `month`."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Get the name of the partition holding the month of `month`."""
+    return f"login_event_y{month.year}m{month.month:02d}"
+
+
+async def maintain_partitions(
+    engine: AsyncEngine,
+    months_ahead: int,
+    retention_months: int,
+    today: Optional[date] = None,
+) -> None:
+    """Create partitions up to `months_ahead`, drop the expired ones."""
+    current = add_months(today or datetime.utcnow().date(), 0)
+    expired_before = add_months(current, -retention_months)
+    table = LoginEventDB.__tablename__
+    async with engine.begin() as conn:
+        # serialize workers running the maintenance at the same time.
+        await conn.execute(
+            sa.text("SELECT pg_advisory_xact_lock(hashtext('login_event_partitions'))")
+        )
+        for i in range(months_ahead + 1):
+            start = add_months(current, i)
+            await conn.execute(
+                sa.text(
+                    f"CREATE TABLE IF NOT EXISTS {partition_name(start)}"
+                    f" PARTITION OF {table} FOR VALUES"
+                    f" FROM ('{start}') TO ('{add_months(start, 1)}')"
+                )
+            )
+        result = await conn.execute(
+            sa.text(
+                "SELECT c.relname FROM pg_inherits i"
+                " JOIN pg_class c ON c.oid = i.inhrelid"
+                f" WHERE i.inhparent = '{table}'::regclass"
+            )
+        )
+        for name in result.scalars():
+            match = PARTITION_NAME.match(name)
+            if match and date(int(match[1]), int(match[2]), 1) < expired_before:
+                await conn.execute(sa.text(f"DROP TABLE {name}"))
+                logger.info(json.dumps({"event": "partition_dropped", "name": name}))
+
+
+class LoginEventRecorder:
+    """Write login events in batches from a bounded in-process queue.
+
+    `record` never waits: an event that finds the queue full is dropped
+    and counted, a slow database must not slow logins down. Events are
+    dropped as well while the recorder is not started, eg. in tests.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        batch_size: int,
+        max_queue: int,
+        flush_interval: float,
+        months_ahead: int,
+        retention_months: int,
+    ) -> None:
+        """Login event recorder initializer."""
+        self.engine = engine
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.written = self.dropped = self.failed = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def pending(self) -> int:
+        """Get number of queued events."""
+        return self._queue.qsize() if self._queue else 0
+
+    def record(
+        self,
+        user_uid: Optional[UUID],
+        login: str,
+        ip_address: Optional[str],
+        user_agent: Optional[str],
+        success: bool,
+    ) -> None:
+        """Queue a login event."""
+        if self._queue is None:
+            return
+        event = dict(
+            uid=uuid7(),
+            occurred_at=datetime.utcnow(),
+            user_uid=user_uid,
+            login=login[:100],
+            ip_address=ip_address[:45] if ip_address else None,
+            user_agent=user_agent[:500] if user_agent else None,
+            success=success,
+        )
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def start(self, maintenance: bool = True) -> None:
+        """Start the writer task, and the partition maintenance task."""
+        self._queue = asyncio.Queue(self.max_queue)
+        self._stopped = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run())]
+        if maintenance:
+            self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self) -> None:
+        """Flush queued events and stop the background tasks."""
+        if self._stopped is None:
+            return
+        self._stopped.set()
+        writer, *others = self._tasks
+        for task in others:
+            task.cancel()
+        for task in others:
+            with suppress(asyncio.CancelledError):
+                await task
+        await writer
+        self._queue = self._stopped = None
+        self._tasks = []
+
+    async def _run(self) -> None:
+        assert self._queue is not None and self._stopped is not None
+        while True:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._stopped.wait(), self.flush_interval)
+            while not self._queue.empty():
+                await self._write(self._take())
+            # checked after flushing, `stop` may run before the first wait.
+            if self._stopped.is_set():
+                return
+
+    def _take(self) -> list[dict[str, Any]]:
+        assert self._queue is not None
+        batch: list[dict[str, Any]] = []
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _write(self, batch: list[dict[str, Any]]) -> None:
+        statement = sa.insert(LoginEventDB.__table__).values(batch)  # type: ignore
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(statement)
+        except (SQLAlchemyError, OSError) as e:
+            self.failed += len(batch)
+            message = {"event": "login_events_failed", "events": len(batch)}
+            logger.warning(json.dumps({**message, "error": str(e)}))
+        else:
+            self.written += len(batch)
+
+    async def _maintain(self) -> None:
+        while True:
+            try:
+                await maintain_partitions(
+                    self.engine, self.months_ahead, self.retention_months
+                )
+            except (SQLAlchemyError, OSError) as e:
+                message = {"event": "partition_maintenance_failed", "error": str(e)}
+                logger.warning(json.dumps(message))
+            await asyncio.sleep(MAINTENANCE_INTERVAL)
+
+
+login_events = LoginEventRecorder(
+    async_engine,
+    batch_size=settings.login_events_batch_size,
+    max_queue=settings.login_events_max_queue,
+    flush_interval=settings.login_events_flush_interval,
+    months_ahead=settings.login_events_months_ahead,
+    retention_months=settings.login_events_retention_months,
+)
+
+registry.callback(
+    "zaer_login_events_total",
+    "Login audit events written, dropped on a full queue or failed to write.",
+    ("outcome",),
+    "counter",
+    lambda: {
+        ("written",): login_events.written,
+        ("dropped",): login_events.dropped,
+        ("failed",): login_events.failed,
+    },
+)
+registry.callback(
+    "zaer_login_events_pending",
+    "Login audit events waiting in the queue.",
+    (),
+    "gauge",
+    lambda: {(): login_events.pending},
+)
@@ -0,0 +1,416 @@
+"""Prometheus text exposition metrics module.
+
+Metrics live in a small in-process registry. When `metrics_multiproc_dir`
+is configured every worker periodically writes a snapshot of its own
+registry to `<dir>/<pid>.json` and `/metrics` merges the snapshots of all
+workers, so any worker can answer a scrape for the whole server.
+"""
+import asyncio
+import json
+import os
+import threading
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.settings import settings
+
+Labels = tuple[str, ...]
+
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Metric:
+    """Base class for all metric kinds."""
+
+    kind = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> None:
+        """Metric initializer."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[Labels, Any] = {}
+
+    def describe(self) -> dict[str, Any]:
+        """Get metric metadata."""
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+        }
+
+    def samples(self) -> list[list[Any]]:
+        """Get `[labels, value]` pairs of the metric."""
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+
+class Counter(Metric):
+    """Monotonically increasing counter."""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Increment counter for labels."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class CallbackMetric(Metric):
+    """Metric whose values are read from a callback at collection time."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str],
+        kind: str,
+        callback: Callable[[], dict[Labels, float]],
+    ) -> None:
+        """Callback metric initializer."""
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.callback = callback
+
+    def samples(self) -> list[list[Any]]:
+        """Get `[labels, value]` pairs of the metric."""
+        return [[list(k), float(v)] for k, v in self.callback().items()]
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: "Histogram", labels: Labels) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.histogram.observe(perf_counter() - self.start, *self.labels)
+
+
+class Histogram(Metric):
+    """Histogram with fixed upper bound buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        """Histogram initializer."""
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def describe(self) -> dict[str, Any]:
+        """Get metric metadata."""
+        return {**super().describe(), "buckets": list(self.buckets)}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Observe value for labels."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # per bucket (not cumulative) counts, the last one is +Inf, and sum
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self) -> list[list[Any]]:
+        """Get `[labels, [bucket_counts, sum]]` pairs of the histogram."""
+        with self._lock:
+            return [[list(k), [list(v[0]), v[1]]] for k, v in self._values.items()]
+
+    def time(self, *labels: str) -> _Timer:
+        """Observe duration of a `with` block."""
+        return _Timer(self, labels)
+
+
+class Registry:
+    """Collection of metrics that can be rendered in text exposition format."""
+
+    def __init__(
+        self, multiproc_dir: Optional[str] = None, flush_interval: float = 5.0
+    ) -> None:
+        """Registry initializer."""
+        self._metrics: dict[str, Metric] = {}
+        self.multiproc_dir = Path(multiproc_dir) if multiproc_dir else None
+        self.flush_interval = flush_interval
+
+    def register(self, metric: Metric) -> Metric:
+        """Register metric."""
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        """Create and register a counter."""
+        return self.register(Counter(name, documentation, labelnames))  # type: ignore
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Create and register a histogram."""
+        metric = Histogram(name, documentation, labelnames, buckets)
+        return self.register(metric)  # type: ignore
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str],
+        kind: str,
+        callback: Callable[[], dict[Labels, float]],
+    ) -> CallbackMetric:
+        """Create and register a callback metric."""
+        metric = CallbackMetric(name, documentation, labelnames, kind, callback)
+        return self.register(metric)  # type: ignore
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get a json serializable snapshot of all metrics of this process."""
+        return {
+            name: {**metric.describe(), "samples": metric.samples()}
+            for name, metric in self._metrics.items()
+        }
+
+    def flush(self) -> None:
+        """Write this process snapshot to the multiprocess directory."""
+        if self.multiproc_dir is not None:
+            _write_snapshot(self.multiproc_dir, self.snapshot())
+
+    async def flush_periodically(self) -> None:
+        """Flush every `flush_interval` seconds, writing off the event loop."""
+        if self.multiproc_dir is None:
+            return
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # callbacks read app state, so only the write leaves the loop.
+            snapshot = self.snapshot()
+            await asyncio.to_thread(_write_snapshot, self.multiproc_dir, snapshot)
+
+    async def collect(self) -> dict[str, Any]:
+        """Get snapshot of all metrics, merged across worker processes."""
+        if self.multiproc_dir is None:
+            return self.snapshot()
+        # callbacks read app state, so only the files are left to a thread.
+        snapshot = self.snapshot()
+        return await asyncio.to_thread(_collect_snapshots, self.multiproc_dir, snapshot)
+
+    async def render(self) -> str:
+        """Render all metrics in prometheus text exposition format."""
+        return render_snapshot(await self.collect())
+
+
+def _write_snapshot(directory: Path, snapshot: dict[str, Any]) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{os.getpid()}.json"
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(snapshot))
+    os.replace(tmp_path, path)
+
+
+def _collect_snapshots(directory: Path, snapshot: dict[str, Any]) -> dict[str, Any]:
+    _write_snapshot(directory, snapshot)
+    snapshots = []
+    for path in directory.glob("*.json"):
+        try:
+            snapshot = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if not _process_alive(int(path.stem)):
+            # gauges of dead workers are meaningless, counters must stay.
+            snapshot = {k: v for k, v in snapshot.items() if v["kind"] != "gauge"}
+        snapshots.append(snapshot)
+    return merge_snapshots(snapshots)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge_snapshots(snapshots: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """Merge registry snapshots by summing samples with equal labels."""
+    merged: dict[str, Any] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = value
+                elif metric["kind"] == "histogram":
+                    counts = [a + b for a, b in zip(current[0], value[0])]
+                    target["samples"][key] = [counts, current[1] + value[1]]
+                else:
+                    target["samples"][key] = current + value
+    for metric in merged.values():
+        metric["samples"] = [[list(k), v] for k, v in metric["samples"].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[Any]) -> str:
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def render_snapshot(snapshot: dict[str, Any]) -> str:
+    """Render a registry snapshot in prometheus text exposition format."""
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        labelnames = metric["labelnames"]
+        lines.append(f"# HELP {name} {_escape(metric['help'])}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels, value in metric["samples"]:
+            if metric["kind"] != "histogram":
+                label_str = _format_labels(labelnames, labels)
+                lines.append(f"{name}{label_str} {_format_value(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            bounds = [*metric["buckets"], float("inf")]
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                label_str = _format_labels(
+                    [*labelnames, "le"], [*labels, _format_value(bound)]
+                )
+                lines.append(f"{name}_bucket{label_str} {cumulative}")
+            label_str = _format_labels(labelnames, labels)
+            lines.append(f"{name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{name}_count{label_str} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry(
+    multiproc_dir=settings.metrics_multiproc_dir,
+    flush_interval=settings.metrics_flush_interval,
+)
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "zaer_http_request_duration_seconds",
+    "HTTP request latency by route and status.",
+    ("method", "route", "status"),
+)
+BCRYPT_SECONDS = registry.histogram(
+    "zaer_bcrypt_duration_seconds",
+    "Password hashing and verification duration.",
+    ("operation",),
+)
+JWT_SECONDS = registry.histogram(
+    "zaer_jwt_duration_seconds",
+    "Access token signing and verification duration.",
+    ("operation",),
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "zaer_db_query_duration_seconds",
+    "Database statement execution duration.",
+    ("statement",),
+)
+DB_POOL_CHECKOUT_SECONDS = registry.histogram(
+    "zaer_db_pool_checkout_duration_seconds",
+    "Time spent waiting for a pooled database connection.",
+)
+
+
+# path templates of routes that do not set `scope["route"]`, by endpoint.
+_endpoint_templates: dict[Any, str] = {}
+
+
+def route_template(scope: Scope) -> str:
+    """Get path template of the route that handled scope."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    endpoint, app = scope.get("endpoint"), scope.get("app")
+    if endpoint is None or app is None:
+        # no route matched, eg. a `404`.
+        return "unmatched"
+    if endpoint not in _endpoint_templates:
+        _endpoint_templates[endpoint] = next(
+            (
+                route.path
+                for route in app.router.routes
+                if getattr(route, "endpoint", None) is endpoint
+            ),
+            "unmatched",
+        )
+    return _endpoint_templates[endpoint]
+
+
+class MetricsMiddleware:
+    """Record latency of every http request by route template and status."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Metrics middleware initializer."""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle ASGI call."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(
+                perf_counter() - start,
+                scope["method"],
+                route_template(scope),
+                str(status_code),
+            )
@@ -0,0 +1,191 @@
+"""On demand request profiling and memory snapshot module."""
+import asyncio
+import sys
+import threading
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from fastapi_jwt_auth import AuthJWT  # type: ignore
+from fastapi_jwt_auth.exceptions import AuthJWTException  # type: ignore
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.settings import settings
+
+PROFILE_HEADER = "x-profile"
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples the call stack of one thread.
+
+    A daemon thread reads the stack of the target thread every `interval`
+    seconds, the result is kept as collapsed stacks, the input format of
+    flamegraph tools. Since the event loop thread is sampled, coroutines of
+    concurrent requests show up in the profile as well.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        """Sampling profiler initializer."""
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[tuple[str, ...]] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def start(self) -> None:
+        """Start sampling."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        """Get samples in collapsed stack format."""
+        return "".join(
+            f"{';'.join(stack)} {count}\n" for stack, count in self.samples.items()
+        )
+
+
+class ProfileStore:
+    """Keep the most recent profiles in memory and optionally on disk."""
+
+    def __init__(self, max_profiles: int, directory: Optional[str] = None) -> None:
+        """Profile store initializer."""
+        self.max_profiles = max_profiles
+        self.directory = Path(directory) if directory else None
+        self._profiles: OrderedDict[str, str] = OrderedDict()
+
+    async def save(self, profile: str) -> str:
+        """Save profile and get its id, the file is written off the event loop."""
+        profile_id = uuid.uuid4().hex
+        self._profiles[profile_id] = profile
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+        if self.directory is not None:
+            path = self.directory / f"{profile_id}.folded"
+            await asyncio.to_thread(_write_profile, path, profile)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[str]:
+        """Get profile by id."""
+        return self._profiles.get(profile_id)
+
+    def ids(self) -> list[str]:
+        """Get ids of the stored profiles, oldest first."""
+        return list(self._profiles)
+
+
+def _write_profile(path: Path, profile: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(profile)
+
+
+class MemorySnapshots:
+    """Named tracemalloc snapshots that can be compared to each other."""
+
+    def __init__(self, max_snapshots: int) -> None:
+        """Memory snapshots initializer."""
+        self.max_snapshots = max_snapshots
+        self._snapshots: OrderedDict[str, tracemalloc.Snapshot] = OrderedDict()
+
+    def start(self, frames: int) -> None:
+        """Start tracing memory allocations."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        """Stop tracing memory allocations and forget snapshots."""
+        tracemalloc.stop()
+        self._snapshots.clear()
+
+    def take(self) -> str:
+        """Take a snapshot and get its id."""
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        snapshot_id = uuid.uuid4().hex
+        self._snapshots[snapshot_id] = snapshot
+        while len(self._snapshots) > self.max_snapshots:
+            self._snapshots.popitem(last=False)
+        return snapshot_id
+
+    def get(self, snapshot_id: str) -> Optional[tracemalloc.Snapshot]:
+        """Get snapshot by id."""
+        return self._snapshots.get(snapshot_id)
+
+    def ids(self) -> list[str]:
+        """Get ids of the stored snapshots, oldest first."""
+        return list(self._snapshots)
+
+
+profile_store = ProfileStore(
+    max_profiles=settings.profiling_max_profiles, directory=settings.profiling_dir
+)
+memory_snapshots = MemorySnapshots(max_snapshots=settings.tracemalloc_max_snapshots)
+
+
+def is_superuser_request(scope: Scope) -> bool:
+    """Check if the request carries a valid access token of an active superuser."""
+    try:
+        claims = AuthJWT(req=Request(scope)).get_raw_jwt()
+    except AuthJWTException:
+        return False
+    return bool(claims and claims.get("is_superuser") and claims.get("is_active"))
+
+
+class ProfilingMiddleware:
+    """Profile requests that ask for it with the `X-Profile` header.
+
+    Only requests of superusers are profiled. The profile id is returned in
+    the `X-Profile-Id` response header and the profile can be downloaded
+    from the admin profiles endpoint.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Profiling middleware initializer."""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle ASGI call."""
+        if scope["type"] != "http" or not any(
+            name == PROFILE_HEADER.encode() for name, _ in scope["headers"]
+        ):
+            await self.app(scope, receive, send)
+            return
+        if not is_superuser_request(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(
+            threading.get_ident(), settings.profiling_sample_interval
+        )
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profiler.stop()
+                profile_id = await profile_store.save(profiler.collapsed())
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
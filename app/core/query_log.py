@@ -0,0 +1,111 @@
+"""Slow query log and per request query budget module."""
+import json
+import logging
+from collections.abc import Callable, Coroutine
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised in strict mode when a request runs more queries than budgeted."""
+
+
+@dataclass
+class QueryStats:
+    """Statements executed while handling one request."""
+
+    count: int = 0
+    budget: Optional[int] = None
+
+
+_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def redact_parameters(parameters: Any) -> Any:
+    """Replace bound parameter values with their type names."""
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact_parameters(p) for p in parameters]
+    return type(parameters).__name__
+
+
+def observe(statement: str, parameters: Any, elapsed: float) -> None:
+    """Count statement for the current request and log it when slow."""
+    stats = _stats.get()
+    if stats is not None:
+        stats.count += 1
+    if elapsed * 1000 >= settings.slow_query_threshold_ms:
+        logger.warning(
+            json.dumps(
+                {
+                    "event": "slow_query",
+                    "ms": round(elapsed * 1000, 2),
+                    "statement": " ".join(statement.split()),
+                    "parameters": redact_parameters(parameters),
+                }
+            )
+        )
+
+
+def query_budget(limit: int) -> Callable[[], Coroutine[Any, Any, None]]:
+    """Create a route dependency that sets the expected statement count."""
+
+    async def set_query_budget() -> None:
+        stats = _stats.get()
+        if stats is not None:
+            stats.budget = limit
+
+    return set_query_budget
+
+
+class QueryBudgetMiddleware:
+    """Count statements per request and check them against the route budget.
+
+    The check runs when the response starts. Going over budget is logged,
+    or raised as `QueryBudgetExceeded` when `query_budget_strict` is set,
+    which is how the test suite turns extra round-trips into failures.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Query budget middleware initializer."""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle ASGI call."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                check_budget(scope, stats)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _stats.reset(token)
+
+
+def check_budget(scope: Scope, stats: QueryStats) -> None:
+    """Report requests that executed more statements than their budget."""
+    if stats.budget is None or stats.count <= stats.budget:
+        return
+    message = (
+        f"{scope['method']} {scope['path']} executed {stats.count} statements,"
+        f" budget is {stats.budget}."
+    )
+    if settings.query_budget_strict:
+        raise QueryBudgetExceeded(message)
+    logger.warning(json.dumps({"event": "query_budget_exceeded", "detail": message}))
@@ -1,4 +1,5 @@
 """Auth service application settings module."""
+from typing import Literal, Optional
 from urllib.parse import quote_plus
 
 from pydantic import BaseSettings, validator
@@ -24,6 +25,10 @@ class Settings(BaseSettings):
     pg_port: int
     pg_test_db: str
     pg_test_port: int
+    # connect to `pg_test_db` on `pg_test_port`, set by the test suite.
+    pg_use_test_db: bool = False
+    # "memory" keeps users in process, eg. to benchmark without a database.
+    user_backend: Literal["postgres", "memory"] = "postgres"
 
     # auth
     pem_key_file_path: str
@@ -39,6 +44,82 @@ class Settings(BaseSettings):
     authjwt_private_key: str = keys.get_assymetric_key(key="private")  # type: ignore
     authjwt_algorithm: str
 
+    # database resilience
+    db_pool_timeout: float = 5.0
+    db_command_timeout: float = 30.0
+    db_statement_timeout_ms: int = 15_000
+    db_breaker_failure_threshold: int = 5
+    db_breaker_reset_timeout: float = 10.0
+    db_breaker_half_open_max: int = 1
+
+    # server, workers and bcrypt threads default to the available cpus.
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: Optional[int] = None
+    server_keepalive: int = 5
+    server_backlog: int = 2048
+    server_preload: bool = False
+    bcrypt_threads: Optional[int] = None
+
+    # lifecycle
+    warm_up_db_connections: int = 2
+    readiness_cache_seconds: float = 1.0
+    readiness_timeout: float = 1.0
+    # seconds readiness fails before the listener closes, once asked to exit.
+    drain_delay: float = 5.0
+    drain_timeout: float = 20.0
+
+    # admission control
+    login_max_concurrency: int = 4
+    login_max_queue: int = 64
+    login_queue_timeout: float = 2.0
+    login_ip_rate: float = 5.0
+    login_ip_burst: int = 20
+    login_username_rate: float = 0.2
+    login_username_burst: int = 5
+
+    # metrics
+    metrics_enabled: bool = True
+    metrics_multiproc_dir: Optional[str] = None
+    metrics_flush_interval: float = 5.0
+    server_timing_enabled: bool = False
+    slow_query_threshold_ms: float = 200.0
+    query_budget_strict: bool = False
+
+    # profiling
+    profiling_enabled: bool = False
+    profiling_sample_interval: float = 0.001
+    profiling_max_profiles: int = 20
+    profiling_dir: Optional[str] = None
+    tracemalloc_max_snapshots: int = 4
+
+    # traffic capture
+    traffic_capture_path: Optional[str] = None
+    traffic_capture_sample_rate: float = 1.0
+
+    # access log, successful reads are logged at the sample rate.
+    access_log_enabled: bool = True
+    access_log_sample_rate: float = 1.0
+    access_log_max_queue: int = 10_000
+
+    # login events
+    login_events_enabled: bool = True
+    login_events_batch_size: int = 500
+    login_events_max_queue: int = 10_000
+    login_events_flush_interval: float = 1.0
+    login_events_months_ahead: int = 2
+    login_events_retention_months: int = 12
+
+    # user stats, cached per worker and dropped on its own writes.
+    user_stats_ttl_seconds: float = 5.0
+
+    # idempotency keys, fingerprints of stored requests are keyed by the secret.
+    idempotency_secret: str
+    idempotency_ttl_seconds: int = 24 * 60 * 60
+    idempotency_cache_size: int = 10_000
+    # an unfinished claim older than this is taken over, its worker died.
+    idempotency_lease_seconds: int = 60
+
     @validator("pg_user", "pg_password", "pg_server", "pg_db", "pg_test_db")
     def url_encode(cls, v):
         """Url quote strings."""
@@ -0,0 +1,103 @@
+"""Per request phase timing and Server-Timing header module."""
+import json
+import logging
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+Phases = list[tuple[str, float, str]]
+
+_phases: ContextVar[Optional[Phases]] = ContextVar("phases", default=None)
+
+
+def record(name: str, duration: float, description: str = "") -> None:
+    """Record phase duration in seconds when the request is being timed."""
+    phases = _phases.get()
+    if phases is not None:
+        phases.append((name, duration, description))
+
+
+class phase:
+    """Record duration of a `with` block as a request phase."""
+
+    __slots__ = ("name", "description", "start")
+
+    def __init__(self, name: str, description: str = "") -> None:
+        """Phase initializer."""
+        self.name = name
+        self.description = description
+
+    def __enter__(self) -> None:
+        """Start timing."""
+        self.start = perf_counter()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Stop timing and record phase."""
+        record(self.name, perf_counter() - self.start, self.description)
+
+
+def server_timing_header(phases: Phases, total: float) -> str:
+    """Format phases as a Server-Timing header value, durations in ms."""
+    metrics = []
+    for name, duration, description in phases:
+        metric = f"{name};dur={duration * 1000:.2f}"
+        if description:
+            metric += f';desc="{description}"'
+        metrics.append(metric)
+    metrics.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(metrics)
+
+
+class ServerTimingMiddleware:
+    """Collect request phases and emit them in a Server-Timing header."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Server timing middleware initializer."""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle ASGI call."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        phases: Phases = []
+        token = _phases.set(phases)
+        start = perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    server_timing_header(phases, perf_counter() - start),
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _phases.reset(token)
+            logger.info(
+                json.dumps(
+                    {
+                        "event": "server_timing",
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status_code,
+                        "total_ms": round((perf_counter() - start) * 1000, 2),
+                        "phases": [
+                            {"name": n, "ms": round(d * 1000, 2), "desc": desc}
+                            for n, d, desc in phases
+                        ],
+                    }
+                )
+            )
@@ -1,19 +1,62 @@
 """FastAPI application entry point module."""
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
 from typing import Final
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi_jwt_auth import AuthJWT  # type: ignore
 from fastapi_jwt_auth.exceptions import AuthJWTException  # type: ignore
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.api import api_router
+from app.core.access_log import AccessLogMiddleware, access_log
+from app.core.capture import TrafficCaptureMiddleware
+from app.core.db import async_engine, is_unavailable
+from app.core.idempotency import purge_expired
+from app.core.lifecycle import DrainMiddleware, drain, readiness, warm_up
+from app.core.login_events import login_events
+from app.core.metrics import MetricsMiddleware, registry
+from app.core.profiling import ProfilingMiddleware
+from app.core.query_log import QueryBudgetMiddleware
 from app.core.settings import settings
+from app.core.timing import ServerTimingMiddleware
 from app.models.health_check import HealthCheck
 
 origins: Final = ["*"]
 
-app = FastAPI(description="ZaEr Authentication App")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Warm up and start background workers, drain and stop them on shutdown."""
+    if settings.access_log_enabled:
+        access_log.start()
+    # with in process users the app runs without a database.
+    database = settings.user_backend == "postgres"
+    await warm_up(async_engine, settings.warm_up_db_connections if database else 0)
+    readiness.warmed_up = True
+    if database and settings.login_events_enabled:
+        login_events.start()
+    purge = asyncio.create_task(purge_expired(async_engine)) if database else None
+    flush = asyncio.create_task(registry.flush_periodically())
+    try:
+        yield
+    finally:
+        await drain.wait(settings.drain_timeout)
+        for task in (purge, flush):
+            if task is not None:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        registry.flush()
+        await login_events.stop()
+        await async_engine.dispose()
+        access_log.stop()
+
+
+app = FastAPI(description="ZaEr Authentication App", lifespan=lifespan)
 
 
 @app.get("/", response_model=HealthCheck, tags=["status"])
@@ -26,6 +69,28 @@ async def health_check() -> HealthCheck:
     )
 
 
+@app.get("/livez", tags=["status"])
+async def livez() -> dict[str, str]:
+    """Get liveness, the event loop answers."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz", tags=["status"])
+async def readyz() -> JSONResponse:
+    """Get readiness to serve traffic, `503` when not ready."""
+    checks = await readiness.check()
+    ready = checks["warmed_up"] and checks["database"] and not checks["draining"]
+    return JSONResponse({"ready": ready, **checks}, status_code=200 if ready else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """Get metrics in prometheus text exposition format."""
+    return PlainTextResponse(
+        await registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 # callback to get your configuration
 @AuthJWT.load_config
 def get_config():
@@ -39,8 +104,37 @@ def authjwt_exception_handler(request: Request, exc: AuthJWTException):
     return JSONResponse(status_code=exc.status_code, content={"detail": exc.message})
 
 
+@app.exception_handler(SQLAlchemyError)
+@app.exception_handler(asyncio.TimeoutError)
+def database_exception_handler(request: Request, exc: Exception):
+    """Answer `503` when the database is down or too slow, `500` otherwise."""
+    if not is_unavailable(exc):
+        raise exc
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "database unavailable, retry later."},
+        headers={"Retry-After": "1"},
+    )
+
+
 app.add_middleware(
     CORSMiddleware, allow_origins=origins, allow_methods=["*"], allow_headers=["*"]
 )
+app.add_middleware(QueryBudgetMiddleware)
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+if settings.traffic_capture_path:
+    app.add_middleware(
+        TrafficCaptureMiddleware,
+        path=settings.traffic_capture_path,
+        sample_rate=settings.traffic_capture_sample_rate,
+    )
+if settings.server_timing_enabled:
+    app.add_middleware(ServerTimingMiddleware)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+if settings.access_log_enabled:
+    app.add_middleware(AccessLogMiddleware)
+app.add_middleware(DrainMiddleware)
 
 app.include_router(api_router, prefix=settings.api_v1_prefix)
@@ -1,4 +1,6 @@
 """Auth application models package."""
+from app.models.idempotency import IdempotencyKeyDB
+from app.models.login_event import LoginEventDB
 from app.models.user import UserDB
 
-__all__ = ("UserDB",)
+__all__ = ("IdempotencyKeyDB", "LoginEventDB", "UserDB")
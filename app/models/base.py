@@ -4,6 +4,8 @@ from datetime import datetime
 
 from sqlmodel import Field, SQLModel, func, text
 
+from app.utils.uuid7 import uuid7
+
 
 class TimestampModel(SQLModel):
     """Model that defines timestamp attributes."""
@@ -24,15 +26,13 @@ class TimestampModel(SQLModel):
 class Base(TimestampModel):
     """Base model with attributes shared among all models."""
 
+    # time ordered, new rows are appended to the right of the primary key
+    # index. the server default only covers rows inserted outside the app.
     uid: uuid.UUID = Field(
-        default_factory=uuid.uuid4,
+        default_factory=uuid7,
         primary_key=True,
-        index=True,
         nullable=False,
-        sa_column_kwargs={
-            "server_default": text("gen_random_uuid()"),
-            "unique": True,
-        },
+        sa_column_kwargs={"server_default": text("gen_random_uuid()")},
     )
     created_by: uuid.UUID = Field(nullable=False)
     modified_by: uuid.UUID = Field(nullable=False)
@@ -0,0 +1,25 @@
+"""Idempotency key models module."""
+from datetime import datetime
+from typing import Callable, ClassVar, Optional, Union
+from uuid import UUID
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class IdempotencyKeyDB(SQLModel, table=True):
+    """Idempotency key claimed by a client, with the response of its request."""
+
+    __tablename__: ClassVar[Union[str, Callable[..., str]]] = "idempotency_key"
+    __table_args__: ClassVar[tuple] = (
+        Index("ix_idempotency_key_created_at", "created_at"),
+    )
+
+    # keys are scoped to the token subject that sent them.
+    subject: UUID = Field(primary_key=True, nullable=False)
+    key: str = Field(max_length=255, primary_key=True, nullable=False)
+    fingerprint: str = Field(max_length=64, nullable=False)
+    # both unset while the first request is in progress.
+    status_code: Optional[int] = Field(default=None, nullable=True)
+    response_body: Optional[bytes] = Field(default=None, nullable=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
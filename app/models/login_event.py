@@ -0,0 +1,30 @@
+"""Login audit event models module."""
+from datetime import datetime
+from typing import Callable, ClassVar, Optional, Union
+from uuid import UUID
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+from app.utils.uuid7 import uuid7
+
+
+class LoginEventDB(SQLModel, table=True):
+    """Login attempt model for the monthly range partitioned table."""
+
+    __tablename__: ClassVar[Union[str, Callable[..., str]]] = "login_event"
+    __table_args__: ClassVar[tuple] = (
+        Index("ix_login_event_user_uid_occurred_at", "user_uid", "occurred_at"),
+        {"postgresql_partition_by": "RANGE (occurred_at)"},
+    )
+
+    # the partition key has to be part of the primary key.
+    uid: UUID = Field(default_factory=uuid7, primary_key=True, nullable=False)
+    occurred_at: datetime = Field(
+        default_factory=datetime.utcnow, primary_key=True, nullable=False
+    )
+    user_uid: Optional[UUID] = Field(default=None, nullable=True)
+    login: str = Field(max_length=100, nullable=False)
+    ip_address: Optional[str] = Field(default=None, max_length=45, nullable=True)
+    user_agent: Optional[str] = Field(default=None, max_length=500, nullable=True)
+    success: bool = Field(nullable=False)
@@ -1,12 +1,19 @@
 """User information models module."""
 from datetime import datetime
-from typing import Callable, ClassVar, Optional, Union
+from typing import Callable, ClassVar, Literal, Optional, Union
 from uuid import UUID
 
+from pydantic import validator
+from sqlalchemy import Index, text
 from sqlmodel import Field, SQLModel
 
 from app.models.base import Base
 
+# users one bulk request may change.
+BULK_MAX_USERS = 1000
+# passwords one bulk request may change, each costs a bcrypt hash.
+BULK_MAX_PASSWORDS = 10
+
 
 class UserBase(SQLModel):
     """User base model with shared attributes."""
@@ -57,6 +64,28 @@ class UserDB(Base, UserBase, table=True):
     """User model for database table."""
 
     __tablename__: ClassVar[Union[str, Callable[..., str]]] = "auth_user"
+    # kept in sync with the indexes of the 0003 to 0005 migrations.
+    __table_args__: ClassVar[tuple] = (
+        # unique, and covering so login lookups are index only scans.
+        Index(
+            "ix_auth_user_username",
+            "username",
+            unique=True,
+            postgresql_include=["hashed_password", "is_active", "uid"],
+        ),
+        Index("ix_auth_user_active_uid", "uid", postgresql_where=text("is_active")),
+        Index("ix_auth_user_staff_uid", "uid", postgresql_where=text("is_staff")),
+        *(
+            Index(
+                f"ix_auth_user_{column}_pattern",
+                column,
+                postgresql_ops={column: "text_pattern_ops"},
+            )
+            for column in ("first_name", "last_name", "username", "email")
+        ),
+    )
+    # indexed by `ix_auth_user_username` of the table args.
+    username: str = Field(max_length=100, nullable=False)
     hashed_password: str = Field(max_length=500, nullable=False)
     last_login: datetime = Field(nullable=True)
 
@@ -77,3 +106,54 @@ class UserReadMany(SQLModel):
 
     count: int
     result: list[UserRead]
+    next: Optional[UUID] = None
+
+
+class UserStats(SQLModel):
+    """User counts model."""
+
+    total: int
+    active: int
+    staff: int
+    superusers: int
+
+
+class UserBulkUpdateItem(UserUpdateBase):
+    """Update of one user in a bulk update."""
+
+    uid: UUID
+
+
+class UserBulkUpdate(SQLModel):
+    """User bulk update model."""
+
+    users: list[UserBulkUpdateItem] = Field(min_items=1, max_items=BULK_MAX_USERS)
+
+    @validator("users")
+    def unique_uids(cls, v):
+        """Reject more than one update of the same user."""
+        if len({item.uid for item in v}) < len(v):
+            raise ValueError("duplicate user uid.")
+        if sum(1 for item in v if item.password) > BULK_MAX_PASSWORDS:
+            raise ValueError(f"more than {BULK_MAX_PASSWORDS} password changes.")
+        return v
+
+
+class UserBulkDeactivate(SQLModel):
+    """User bulk deactivate model."""
+
+    uids: list[UUID] = Field(min_items=1, max_items=BULK_MAX_USERS)
+
+
+class UserBulkResult(SQLModel):
+    """Outcome of a bulk operation for one user."""
+
+    uid: UUID
+    status: Literal["updated", "not_found"]
+
+
+class UserBulkResultMany(SQLModel):
+    """User bulk operation result model."""
+
+    updated: int
+    result: list[UserBulkResult]
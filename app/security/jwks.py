@@ -0,0 +1,34 @@
+"""Auth app json web key set module."""
+import base64
+import hashlib
+import json
+from typing import Any
+
+from cryptography.hazmat.primitives import serialization  # type: ignore
+from cryptography.hazmat.primitives.asymmetric import rsa  # type: ignore
+
+from app.core.settings import settings
+
+
+def base64url_uint(value: int) -> str:
+    """Encode an unsigned integer as unpadded base64url of its big endian bytes."""
+    data = value.to_bytes((value.bit_length() + 7) // 8 or 1, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def public_jwk(public_key_pem: str, algorithm: str) -> dict[str, Any]:
+    """Get the json web key of an rsa public key, its `kid` is its thumbprint."""
+    public_key = serialization.load_pem_public_key(public_key_pem.encode())
+    if not isinstance(public_key, rsa.RSAPublicKey):
+        raise ValueError("the public key is not an rsa key.")
+    numbers = public_key.public_numbers()
+    jwk = {"e": base64url_uint(numbers.e), "kty": "RSA", "n": base64url_uint(numbers.n)}
+    # rfc 7638 thumbprint, the sorted required members without whitespace.
+    canonical = json.dumps(jwk, separators=(",", ":"), sort_keys=True).encode()
+    digest = hashlib.sha256(canonical).digest()
+    kid = base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+    return {**jwk, "kid": kid, "alg": algorithm, "use": "sig"}
+
+
+JWK = public_jwk(settings.authjwt_public_key, settings.authjwt_algorithm)
+KID: str = JWK["kid"]
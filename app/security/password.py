@@ -1,14 +1,58 @@
 """Auth app password hashing and validation module."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 from passlib.context import CryptContext  # type: ignore
 
+from app.core.metrics import BCRYPT_SECONDS
+from app.core.settings import settings
+from app.utils.cpu import available_cpus
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")  # type: ignore
 
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def bcrypt_threads() -> int:
+    """Get bcrypt thread count, the cpus left to each worker process by default."""
+    if settings.bcrypt_threads:
+        return settings.bcrypt_threads
+    cpus = available_cpus()
+    return max(1, cpus // (settings.server_workers or cpus))
+
+
+def bcrypt_executor() -> ThreadPoolExecutor:
+    """Get the bcrypt thread pool, created on first use so never before a fork."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(bcrypt_threads(), thread_name_prefix="bcrypt")
+    return _executor
+
 
 def verify_password(plain_password, hashed_password):
     """Verify user password."""
-    return pwd_context.verify(plain_password, hashed_password)
+    with BCRYPT_SECONDS.time("verify"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(plain_password: str):
     """Hash user password."""
-    return pwd_context.hash(plain_password)
+    with BCRYPT_SECONDS.time("hash"):
+        return pwd_context.hash(plain_password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify user password off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        bcrypt_executor(), verify_password, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(plain_password: str) -> str:
+    """Hash user password off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        bcrypt_executor(), get_password_hash, plain_password
+    )
@@ -1,5 +1,6 @@
 """Pytest configuration module."""
 import asyncio
+import os
 import uuid
 from typing import AsyncGenerator, Final, Generator
 
@@ -10,16 +11,23 @@ from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.db import async_engine
-from app.core.settings import settings
-from app.main import app
+# read by settings, so it must be set before the app is imported.
+os.environ["PG_USE_TEST_DB"] = "true"
+os.environ["USER_BACKEND"] = "postgres"
+
+from app.core.db import async_engine  # noqa: E402
+from app.core.settings import settings  # noqa: E402
+from app.main import app  # noqa: E402
 
 # for models to be detected before calling metadata.create_all
-from app.models import UserDB
-from app.security import password
+from app.models import UserDB  # noqa: E402
+from app.security import password  # noqa: E402
 
 TEST_URL: Final = f"http://{settings.api_v1_prefix}"
 
+# fail tests of endpoints that run more statements than their query budget.
+settings.query_budget_strict = True
+
 
 def event_loop(request) -> Generator:  # noqa: indirect usage
     """Get the event loop."""
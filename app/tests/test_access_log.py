@@ -0,0 +1,75 @@
+"""Access log tests module."""
+import io
+import json
+import logging
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from app.core.access_log import AccessLog, JsonFormatter, access_log
+from app.core.settings import settings
+
+
+def test_formatter_redacts_credentials():
+    record = logging.LogRecord("zaer.access", logging.INFO, "", 0, {}, None, None)
+    record.msg = {"event": "access", "password": "secret", "token": "abc"}
+    content = JsonFormatter().format(record)
+    assert "secret" not in content and "abc" not in content
+    assert json.loads(content)["event"] == "access"
+
+
+def test_full_queue_drops_records():
+    log = AccessLog(max_queue=1, sample_rate=1.0)
+    # no listener thread, nothing takes records off the queue.
+    log.logger.addHandler(log._handler)
+    try:
+        for _ in range(3):
+            log.logger.info({"event": "access"})
+    finally:
+        log.logger.removeHandler(log._handler)
+    assert log.pending == 1
+    assert log.dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_access_log(client: AsyncClient, monkeypatch):
+    stream = io.StringIO()
+    access_log.start(stream)
+    try:
+        response = await client.get(
+            "users", params={"limit": 1}, headers={"X-Request-ID": "abc-123"}
+        )
+        login = await client.post(
+            "login", json={"username": "hosi", "password": "do-not-log-me"}
+        )
+    finally:
+        access_log.stop()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["X-Request-ID"] == "abc-123"
+    assert login.status_code == status.HTTP_400_BAD_REQUEST
+    content = stream.getvalue()
+    assert "do-not-log-me" not in content
+    assert client.headers["Authorization"].split()[1] not in content
+
+    read, write = [json.loads(line) for line in content.splitlines()]
+    assert read["request_id"] == "abc-123"
+    assert read["route"] == f"{settings.api_v1_prefix}/users"
+    assert read["status"] == status.HTTP_200_OK
+    assert read["subject"] is not None and read["ms"] >= 0
+    assert write["route"] == f"{settings.api_v1_prefix}/login"
+    assert write["status"] == status.HTTP_400_BAD_REQUEST
+    assert write["subject"] is None
+
+    # successful reads are sampled, writes and errors are always logged.
+    monkeypatch.setattr(access_log, "sample_rate", 0.0)
+    stream = io.StringIO()
+    access_log.start(stream)
+    try:
+        await client.get("users", params={"limit": 1})
+        await client.get("users", params={"limit": 0})
+    finally:
+        access_log.stop()
+    (record,) = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert record["status"] == status.HTTP_422_UNPROCESSABLE_ENTITY
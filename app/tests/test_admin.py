@@ -0,0 +1,63 @@
+"""Admin diagnostics api tests module."""
+from typing import Final
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient, Headers
+
+from app.core.profiling import ProfileStore, ProfilingMiddleware, profile_store
+from app.main import app
+from app.tests.conftest import TEST_URL
+
+ENDPOINT: Final = "admin"
+
+
+@pytest.mark.asyncio
+async def test_profile_request(client: AsyncClient, headers: Headers):
+    async with AsyncClient(app=ProfilingMiddleware(app), base_url=TEST_URL) as c:
+        c.headers = headers
+        response = await c.get("users", headers={"X-Profile": "1"})
+
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    profile_id = response.headers["X-Profile-Id"]
+    assert profile_store.get(profile_id) is not None
+
+    response = await client.get(f"{ENDPOINT}/profiles/{profile_id}")
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_profile_store_writes_to_directory(tmp_path):
+    store = ProfileStore(max_profiles=1, directory=str(tmp_path / "profiles"))
+    profile_id = await store.save("main 1\n")
+
+    assert (tmp_path / "profiles" / f"{profile_id}.folded").read_text() == "main 1\n"
+    await store.save("main 2\n")
+    assert store.ids() != [profile_id]
+
+
+@pytest.mark.asyncio
+async def test_profile_requires_superuser():
+    async with AsyncClient(app=ProfilingMiddleware(app), base_url=TEST_URL) as c:
+        response = await c.get("public-key", headers={"X-Profile": "1"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "X-Profile-Id" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_memory_snapshot_diff(client: AsyncClient):
+    response = await client.post(f"{ENDPOINT}/tracemalloc/start")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    first = (await client.post(f"{ENDPOINT}/tracemalloc/snapshots")).json()
+    await client.get("users")
+    second = (await client.post(f"{ENDPOINT}/tracemalloc/snapshots")).json()
+    response = await client.get(
+        f"{ENDPOINT}/tracemalloc/diff",
+        params={"first": first["snapshot_id"], "second": second["snapshot_id"]},
+    )
+    await client.post(f"{ENDPOINT}/tracemalloc/stop")
+
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert isinstance(response.json(), list)
@@ -0,0 +1,82 @@
+"""Admission control tests module."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException, status
+
+from app.core.admission import ConcurrencyLimiter, TokenBucketThrottle
+
+
+@pytest.mark.asyncio
+async def test_limiter_queues_then_admits():
+    limiter = ConcurrencyLimiter(
+        "test", max_concurrency=1, max_queue=1, queue_timeout=1
+    )
+    order = []
+
+    async def work(name: str):
+        async with limiter.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(work("first"), work("second"))
+
+    assert order == ["first", "second"]
+    assert limiter.stats.admitted == 2
+    assert limiter.stats.queued == 1
+    assert limiter.stats.shed == 0
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_sheds_when_queue_is_full():
+    limiter = ConcurrencyLimiter(
+        "test", max_concurrency=1, max_queue=0, queue_timeout=1
+    )
+
+    async with limiter.slot():
+        with pytest.raises(HTTPException) as exc_info:
+            async with limiter.slot():
+                pass
+
+    assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert exc_info.value.headers == {"Retry-After": "1"}
+    assert limiter.stats.shed == 1
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_sheds_after_queue_timeout():
+    limiter = ConcurrencyLimiter(
+        "test", max_concurrency=1, max_queue=1, queue_timeout=0.01
+    )
+
+    async with limiter.slot():
+        with pytest.raises(HTTPException):
+            async with limiter.slot():
+                pass
+        assert limiter.waiting == 0
+
+    assert limiter.stats.queued == 1
+    assert limiter.stats.shed == 1
+    assert limiter.in_flight == 0
+
+
+def test_token_bucket_throttles_after_burst():
+    throttle = TokenBucketThrottle(rate=1.0, burst=2)
+
+    assert throttle.hit("10.0.0.1") == 0
+    assert throttle.hit("10.0.0.1") == 0
+    assert throttle.hit("10.0.0.1") > 0
+    assert throttle.hit("10.0.0.2") == 0
+    assert throttle.throttled == 1
+
+
+def test_token_bucket_evicts_least_recently_used_keys():
+    throttle = TokenBucketThrottle(rate=1.0, burst=1, max_keys=2)
+
+    throttle.hit("a")
+    throttle.hit("b")
+    throttle.hit("c")
+
+    assert throttle.hit("a") == 0
@@ -0,0 +1,43 @@
+"""Traffic capture tests module."""
+import json
+import uuid
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient, Headers
+
+from app.core.capture import TraceWriter, TrafficCaptureMiddleware
+from app.core.settings import settings
+from app.main import app
+from app.tests.conftest import TEST_URL
+
+
+@pytest.mark.asyncio
+async def test_capture_request_shape(tmp_path, headers: Headers):
+    trace = tmp_path / "trace.jsonl"
+    capture_app = TrafficCaptureMiddleware(app, path=str(trace))
+
+    async with AsyncClient(app=capture_app, base_url=TEST_URL) as client:
+        client.headers = headers
+        response = await client.get(f"users/{uuid.uuid4()}")
+    capture_app.writer.flush()
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    content = trace.read_text()
+    record = json.loads(content)
+    assert record["route"] == f"{settings.api_v1_prefix}/users/{{user_uid}}"
+    assert record["method"] == "GET"
+    assert record["status"] == status.HTTP_404_NOT_FOUND
+    assert headers["Authorization"].split()[1] not in content
+
+
+def test_trace_writer_appends_batches_from_its_thread(tmp_path):
+    trace = tmp_path / "traces" / "trace.jsonl"
+    writer = TraceWriter(str(trace), batch_size=2)
+    for i in range(3):
+        writer.write({"i": i})
+    writer._batches.join()
+
+    assert [json.loads(line)["i"] for line in trace.read_text().splitlines()] == [0, 1]
+    writer.flush()
+    assert len(trace.read_text().splitlines()) == 3
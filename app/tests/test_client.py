@@ -0,0 +1,71 @@
+"""Token verifier client tests module."""
+import uuid
+from typing import Final
+
+import pytest
+from fastapi import Depends, FastAPI, status
+from fastapi_jwt_auth import AuthJWT  # type: ignore
+from httpx import AsyncClient
+
+from app.client import InvalidToken, TokenVerifier
+from app.core.settings import settings
+from app.main import app
+from app.security.jwks import KID
+
+AUTH_URL: Final = f"http://auth{settings.api_v1_prefix}"
+
+
+def access_token(is_superuser: bool = True, **headers: str) -> str:
+    user_claims = {"is_superuser": is_superuser, "is_staff": True, "is_active": True}
+    return AuthJWT().create_access_token(
+        subject=str(uuid.uuid4()), user_claims=user_claims, headers=headers or None
+    )
+
+
+@pytest.mark.asyncio
+async def test_verify_tokens():
+    async with AsyncClient(app=app) as client:
+        verifier = TokenVerifier(AUTH_URL, client, keys_ttl=0)
+
+        # tokens without a `kid` are verified with the only key.
+        token = access_token()
+        assert (await verifier.verify(token))["is_superuser"] is True
+        claims = await verifier.verify(access_token(kid=KID))
+        assert claims["type"] == "access"
+        assert (verifier.fetches, verifier.revalidations) == (1, 1)
+
+        # a token verified before is served from the cache.
+        assert await verifier.verify(token) is await verifier.verify(token)
+        assert verifier.revalidations == 1
+
+        with pytest.raises(InvalidToken):
+            await verifier.verify(access_token(kid="rotated"))
+        with pytest.raises(InvalidToken):
+            await verifier.verify(f"{token[:-4]}AAAA")
+        refresh_token = AuthJWT().create_refresh_token(subject="x")
+        with pytest.raises(InvalidToken):
+            await verifier.verify(refresh_token)
+
+
+@pytest.mark.asyncio
+async def test_superuser_dependency():
+    async with AsyncClient(app=app) as auth_client:
+        verifier = TokenVerifier(AUTH_URL, auth_client)
+        service = FastAPI()
+
+        @service.get("/")
+        async def root(claims: dict = Depends(verifier.superuser)):
+            return {"sub": claims["sub"]}
+
+        async with AsyncClient(app=service, base_url="http://service") as client:
+            response = await client.get("/")
+            assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+            headers = {"Authorization": f"Bearer {access_token(is_superuser=False)}"}
+            response = await client.get("/", headers=headers)
+            assert response.status_code == status.HTTP_401_UNAUTHORIZED
+            assert response.json()["detail"] == "insufficient privileges."
+
+            headers = {"Authorization": f"Bearer {access_token(kid=KID)}"}
+            response = await client.get("/", headers=headers)
+            assert response.status_code == status.HTTP_200_OK, response.json()
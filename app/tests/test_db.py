@@ -0,0 +1,58 @@
+"""Database resilience tests module."""
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException, status
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.db import CircuitBreaker, async_engine, deadline, is_unavailable
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05, half_open_max=1)
+    breaker.failure()
+    breaker.check()
+    breaker.failure()
+    assert breaker.state == "open"
+    with pytest.raises(HTTPException) as e:
+        breaker.check()
+    assert e.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert e.value.headers["Retry-After"] == "1"
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    breaker.check()  # the probe passes, others wait for its outcome.
+    with pytest.raises(HTTPException):
+        breaker.check()
+    breaker.failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    breaker.check()
+    breaker.success()
+    assert breaker.state == "closed"
+    assert breaker.rejected == 2
+
+
+def test_is_unavailable():
+    assert is_unavailable(asyncio.TimeoutError())
+    assert is_unavailable(PoolTimeoutError())
+    assert is_unavailable(ConnectionRefusedError())
+    assert not is_unavailable(ValueError())
+
+
+@pytest.mark.asyncio
+async def test_deadline_sets_statement_timeout():
+    dependency = deadline(1.5)()
+    await dependency.__anext__()
+    try:
+        async with async_engine.begin() as conn:
+            result = await conn.execute(text("SHOW statement_timeout"))
+            timeout = result.scalar()
+    finally:
+        with pytest.raises(StopAsyncIteration):
+            await dependency.__anext__()
+    assert timeout.endswith("ms")
+    assert 1000 < int(timeout.removesuffix("ms")) <= 1500
@@ -0,0 +1,95 @@
+"""Idempotency key tests module."""
+import copy
+from datetime import datetime, timedelta
+from typing import Final
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.settings import settings
+from app.models import UserDB
+from app.models.idempotency import IdempotencyKeyDB
+
+ENDPOINT: Final = "users"
+USER_TEST_DATA: Final = {
+    "first_name": "Semere",
+    "last_name": "Tewelde",
+    "username": "user1",
+    "password": "password",
+    "email": "user1@zaer.com",
+}
+
+
+async def user_count(session: AsyncSession) -> int:
+    """Get number of users."""
+    statement = select(func.count()).select_from(UserDB)  # type: ignore
+    result = await session.exec(statement)
+    return result.one()
+
+
+@pytest.mark.asyncio
+async def test_retry_replays_response(client: AsyncClient, session: AsyncSession):
+    headers = {"Idempotency-Key": "create-user1"}
+    first = await client.post(ENDPOINT, json=USER_TEST_DATA, headers=headers)
+    retry = await client.post(ENDPOINT, json=USER_TEST_DATA, headers=headers)
+
+    assert first.status_code == status.HTTP_201_CREATED, first.json()
+    assert retry.status_code == status.HTTP_201_CREATED, retry.json()
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert await user_count(session) == 2  # with the conftest user
+
+
+@pytest.mark.asyncio
+async def test_error_is_replayed(client: AsyncClient, session: AsyncSession):
+    await client.post(ENDPOINT, json=USER_TEST_DATA)
+    headers = {"Idempotency-Key": "duplicate"}
+    first = await client.post(ENDPOINT, json=USER_TEST_DATA, headers=headers)
+    retry = await client.post(ENDPOINT, json=USER_TEST_DATA, headers=headers)
+
+    assert first.status_code == status.HTTP_400_BAD_REQUEST, first.json()
+    assert retry.status_code == status.HTTP_400_BAD_REQUEST, retry.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+
+@pytest.mark.asyncio
+async def test_key_reuse_for_other_request(client: AsyncClient, session: AsyncSession):
+    headers = {"Idempotency-Key": "reused"}
+    await client.post(ENDPOINT, json=USER_TEST_DATA, headers=headers)
+    payload = copy.deepcopy(USER_TEST_DATA)
+    payload["username"] = "user2"
+    response = await client.post(ENDPOINT, json=payload, headers=headers)
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert await user_count(session) == 2
+
+
+@pytest.mark.asyncio
+async def test_abandoned_claim_is_taken_over(
+    client: AsyncClient, session: AsyncSession, user: UserDB
+):
+    lease = timedelta(seconds=settings.idempotency_lease_seconds)
+    # claims left unfinished by a worker that died while running the request.
+    for key, age in (("abandoned", 2 * lease), ("in-progress", lease / 2)):
+        session.add(
+            IdempotencyKeyDB(
+                subject=user.uid,
+                key=key,
+                fingerprint="0" * 64,
+                created_at=datetime.utcnow() - age,
+            )
+        )
+    await session.commit()
+
+    headers = {"Idempotency-Key": "in-progress"}
+    response = await client.post(ENDPOINT, json=USER_TEST_DATA, headers=headers)
+    # still claimed, by a request with another fingerprint.
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    headers = {"Idempotency-Key": "abandoned"}
+    response = await client.post(ENDPOINT, json=USER_TEST_DATA, headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED, response.json()
+    assert await user_count(session) == 2
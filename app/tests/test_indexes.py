@@ -0,0 +1,66 @@
+"""Query plan tests module."""
+import pytest
+from sqlalchemy import text
+
+from app.core.db import async_engine
+from app.models import UserDB
+
+
+async def explain(sql: str, **params) -> str:
+    """
+    Get the query plan of sql, sequential scans disabled.
+
+    Test tables are small enough for a sequential scan to always win, so
+    the plans only show that a matching index exists and is usable.
+    """
+    async with async_engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        # index only scans rely on the visibility map.
+        await conn.execute(text("VACUUM ANALYZE auth_user"))
+    async with async_engine.begin() as conn:
+        await conn.execute(text("SET LOCAL enable_seqscan = off"))
+        result = await conn.execute(text(f"EXPLAIN {sql}"), params)
+        return "\n".join(row[0] for row in result)
+
+
+@pytest.mark.asyncio
+async def test_login_lookup_is_index_only(user: UserDB):
+    plan = await explain(
+        "SELECT uid, hashed_password, is_active FROM auth_user"
+        " WHERE username = :username",
+        username=user.username,
+    )
+    assert "Index Only Scan using ix_auth_user_username on" in plan, plan
+
+
+@pytest.mark.asyncio
+async def test_email_login_lookup_uses_unique_indexes(user: UserDB):
+    plan = await explain(
+        "SELECT uid, hashed_password, is_active FROM auth_user"
+        " WHERE username = :login OR email = :login",
+        login=user.email,
+    )
+    assert "ix_auth_user_email" in plan, plan
+    assert "Seq Scan" not in plan, plan
+
+
+@pytest.mark.asyncio
+async def test_active_users_use_partial_index(user: UserDB):
+    plan = await explain(
+        "SELECT uid FROM auth_user WHERE is_active ORDER BY uid LIMIT 10"
+    )
+    assert "ix_auth_user_active_uid" in plan, plan
+
+
+@pytest.mark.asyncio
+async def test_prefix_search_uses_pattern_indexes(user: UserDB):
+    plan = await explain(
+        "SELECT uid FROM auth_user WHERE first_name LIKE :q OR last_name LIKE :q"
+        " OR username LIKE :q OR email LIKE :q",
+        q="hos%",
+    )
+    # username and email have other indexes usable for prefixes under the
+    # C collation, the names only have their pattern indexes.
+    assert "ix_auth_user_first_name_pattern" in plan, plan
+    assert "ix_auth_user_last_name_pattern" in plan, plan
+    assert "Seq Scan" not in plan, plan
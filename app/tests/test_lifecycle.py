@@ -0,0 +1,68 @@
+"""Warm-up, readiness and drain tests module."""
+import asyncio
+import signal
+
+import pytest
+import uvicorn
+from fastapi import status
+from httpx import AsyncClient
+
+from app.__main__ import DrainingServer
+from app.core.lifecycle import Drain, drain, readiness
+from app.core.settings import settings
+from app.main import app
+
+
+@pytest.mark.asyncio
+async def test_probes(monkeypatch):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/livez")
+        assert response.status_code == status.HTTP_200_OK
+
+        # the lifespan does not run under the test client.
+        response = await client.get("/readyz")
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.json()["warmed_up"] is False
+
+        monkeypatch.setattr(readiness, "warmed_up", True)
+        response = await client.get("/readyz")
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        assert response.json()["database"] is True
+
+        monkeypatch.setattr(drain, "draining", True)
+        response = await client.get("/")
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        response = await client.get("/livez")
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_in_flight_requests():
+    draining = Drain()
+    draining.enter()
+    waiter = asyncio.create_task(draining.wait(timeout=1))
+    await asyncio.sleep(0)
+    assert draining.draining and not waiter.done()
+    draining.exit()
+    assert await waiter is True
+
+    draining = Drain()
+    draining.enter()
+    assert await draining.wait(timeout=0.01) is False
+
+
+@pytest.mark.asyncio
+async def test_draining_server_drains_before_exiting(monkeypatch):
+    monkeypatch.setattr(settings, "drain_delay", 0.05)
+    monkeypatch.setattr(drain, "draining", False)
+    server = DrainingServer(uvicorn.Config(app))
+    server.handle_exit(signal.SIGTERM, None)
+    assert drain.draining and not server.should_exit
+    await asyncio.sleep(0.05)
+    assert await server.on_tick(1) is True
+
+    # a second signal exits right away.
+    server = DrainingServer(uvicorn.Config(app))
+    server.handle_exit(signal.SIGTERM, None)
+    server.handle_exit(signal.SIGTERM, None)
+    assert server.should_exit
@@ -86,3 +86,55 @@ async def test_invalid_password(client: AsyncClient, session: AsyncSession):
 
     assert response.status_code == status.HTTP_400_BAD_REQUEST, response.json()
     assert response.json()["detail"] == "invalid username or password."
+
+
+@pytest.mark.asyncio
+async def test_login_with_email(client: AsyncClient, session: AsyncSession):
+    user = UserDB(
+        first_name="haile",
+        last_name="marikos",
+        username="haile123",
+        hashed_password=password.get_password_hash("hailepassword"),
+        email="haile123@zaer.com",
+        created_by=uuid.UUID(USER_ID),
+        modified_by=uuid.UUID(USER_ID),
+        last_login=None,
+    )
+    session.add(user)
+    await session.commit()
+
+    payload = dict(username=" Haile123@Zaer.com", password="hailepassword")
+    response = await client.post(f"{ENDPOINT}", json=payload)
+
+    assert response.status_code == status.HTTP_201_CREATED, response.json()
+    assert response.json()["user"]["username"] == "haile123"
+
+
+@pytest.mark.asyncio
+async def test_login_username_wins_over_email(
+    client: AsyncClient, session: AsyncSession
+):
+    # one user's username is another one's email.
+    for username, email, secret in (
+        ("haile123@zaer.com", "haile@zaer.com", "usernamepassword"),
+        ("haile123", "haile123@zaer.com", "emailpassword"),
+    ):
+        session.add(
+            UserDB(
+                first_name="haile",
+                last_name="marikos",
+                username=username,
+                hashed_password=password.get_password_hash(secret),
+                email=email,
+                created_by=uuid.UUID(USER_ID),
+                modified_by=uuid.UUID(USER_ID),
+                last_login=None,
+            )
+        )
+    await session.commit()
+
+    payload = dict(username="haile123@zaer.com", password="usernamepassword")
+    response = await client.post(f"{ENDPOINT}", json=payload)
+
+    assert response.status_code == status.HTTP_201_CREATED, response.json()
+    assert response.json()["user"]["username"] == "haile123@zaer.com"
@@ -0,0 +1,71 @@
+"""Login audit events tests module."""
+from datetime import date
+
+import pytest
+import sqlalchemy as sa
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.db import async_engine
+from app.core.login_events import (
+    LoginEventRecorder,
+    add_months,
+    maintain_partitions,
+    partition_name,
+)
+from app.models import LoginEventDB, UserDB
+
+
+async def partitions() -> set[str]:
+    """Get names of the login_event partitions."""
+    async with async_engine.connect() as conn:
+        result = await conn.execute(
+            sa.text(
+                "SELECT c.relname FROM pg_inherits i"
+                " JOIN pg_class c ON c.oid = i.inhrelid"
+                " WHERE i.inhparent = 'login_event'::regclass"
+            )
+        )
+        return set(result.scalars())
+
+
+def test_add_months():
+    assert add_months(date(2026, 11, 30), 0) == date(2026, 11, 1)
+    assert add_months(date(2026, 11, 30), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 15), -13) == date(2024, 12, 1)
+
+
+@pytest.mark.asyncio
+async def test_partition_maintenance(session: AsyncSession):
+    await maintain_partitions(async_engine, 1, 12, today=date(2020, 1, 10))
+    assert await partitions() == {"login_event_y2020m01", "login_event_y2020m02"}
+
+    today = date.today()
+    await maintain_partitions(async_engine, 1, 12, today=today)
+    assert await partitions() == {
+        partition_name(add_months(today, 0)),
+        partition_name(add_months(today, 1)),
+    }
+
+
+@pytest.mark.asyncio
+async def test_recorder_batches_and_backpressure(user: UserDB, session: AsyncSession):
+    await maintain_partitions(async_engine, 0, 12)
+    recorder = LoginEventRecorder(
+        async_engine,
+        batch_size=2,
+        max_queue=3,
+        flush_interval=60,
+        months_ahead=0,
+        retention_months=12,
+    )
+    recorder.record(user.uid, "hosi", "10.0.0.1", "pytest", success=True)
+    assert recorder.pending == 0  # not started, dropped silently.
+
+    recorder.start(maintenance=False)
+    for _ in range(4):
+        recorder.record(user.uid, "hosi", "10.0.0.1", "pytest", success=False)
+    await recorder.stop()
+
+    assert (recorder.written, recorder.dropped) == (3, 1)
+    result = await session.execute(sa.select(sa.func.count()).select_from(LoginEventDB))
+    assert result.scalar() == 3
@@ -0,0 +1,85 @@
+"""Metrics endpoint tests module."""
+import asyncio
+import json
+import os
+
+import pytest
+from fastapi import FastAPI, status
+from httpx import AsyncClient
+
+from app.core.metrics import Registry, merge_snapshots, render_snapshot, route_template
+from app.core.settings import settings
+from app.main import app
+
+
+def test_render_histogram():
+    registry = Registry()
+    histogram = registry.histogram("latency", "Latency.", ("route",), (0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+
+    text = render_snapshot(registry.snapshot())
+
+    assert "# TYPE latency histogram" in text
+    assert 'latency_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_bucket{route="/a",le="1.0"} 2' in text
+    assert 'latency_bucket{route="/a",le="+Inf"} 2' in text
+    assert 'latency_count{route="/a"} 2' in text
+
+
+def test_merge_worker_snapshots():
+    registry = Registry()
+    counter = registry.counter("hits", "Hits.", ("route",))
+    counter.inc("/a")
+    snapshot = registry.snapshot()
+
+    merged = merge_snapshots([snapshot, snapshot])
+
+    assert merged["hits"]["samples"] == [[["/a"], 2.0]]
+
+
+@pytest.mark.asyncio
+async def test_flush_periodically(tmp_path):
+    registry = Registry(str(tmp_path), flush_interval=0.01)
+    registry.counter("hits", "Hits.").inc()
+
+    flush = asyncio.create_task(registry.flush_periodically())
+    await asyncio.sleep(0.1)
+    flush.cancel()
+
+    assert "hits" in (tmp_path / f"{os.getpid()}.json").read_text()
+
+
+def test_route_template_of_plain_routes():
+    async def endpoint(request):
+        pass
+
+    service = FastAPI()
+    service.add_route("/items/{item_id}", endpoint)
+
+    assert route_template({"app": service, "endpoint": endpoint}) == "/items/{item_id}"
+    assert route_template({"app": service}) == "unmatched"
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client: AsyncClient):
+    await client.get("public-key")
+
+    async with AsyncClient(app=app, base_url="http://test") as metrics_client:
+        response = await metrics_client.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "zaer_http_request_duration_seconds_bucket" in response.text
+    assert f'route="{settings.api_v1_prefix}/public-key"' in response.text
+
+
+@pytest.mark.asyncio
+async def test_collect_merges_worker_snapshots(tmp_path):
+    registry = Registry(str(tmp_path))
+    registry.counter("hits", "Hits.").inc()
+    worker = {"hits": {**registry.snapshot()["hits"], "samples": [[[], 2.0]]}}
+    (tmp_path / "1.json").write_text(json.dumps(worker))
+
+    collected = await registry.collect()
+
+    assert collected["hits"]["samples"] == [[[], 3.0]]
@@ -6,6 +6,7 @@ from fastapi import status
 from httpx import AsyncClient
 
 from app.core.settings import settings
+from app.security.jwks import KID
 
 ENDPOINT: Final = "public-key"
 
@@ -16,3 +17,17 @@ async def test_get_public_key(client: AsyncClient):
 
     assert response.status_code == status.HTTP_200_OK, response.json()
     assert response.json()["public_key"] == settings.authjwt_public_key
+
+
+@pytest.mark.asyncio
+async def test_get_jwks_revalidated(client: AsyncClient):
+    response = await client.get(f"{ENDPOINT}/jwks")
+
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    (key,) = response.json()["keys"]
+    assert key["kid"] == KID
+    assert key["alg"] == settings.authjwt_algorithm
+
+    headers = {"If-None-Match": response.headers["ETag"]}
+    response = await client.get(f"{ENDPOINT}/jwks", headers=headers)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
@@ -0,0 +1,28 @@
+"""Slow query log and query budget tests module."""
+import pytest
+
+from app.core.query_log import (
+    QueryBudgetExceeded,
+    QueryStats,
+    check_budget,
+    redact_parameters,
+)
+
+SCOPE = {"type": "http", "method": "GET", "path": "/users"}
+
+
+def test_redact_parameters():
+    redacted = redact_parameters(("hosi", 10, None))
+
+    assert redacted == ["str", "int", "NoneType"]
+    assert redact_parameters({"password": "secret"}) == {"password": "str"}
+
+
+def test_query_budget_within_limit():
+    check_budget(SCOPE, QueryStats(count=1, budget=1))
+    check_budget(SCOPE, QueryStats(count=5, budget=None))
+
+
+def test_query_budget_exceeded_in_strict_mode():
+    with pytest.raises(QueryBudgetExceeded):
+        check_budget(SCOPE, QueryStats(count=2, budget=1))
@@ -0,0 +1,30 @@
+"""Server timing tests module."""
+import pytest
+from fastapi import status
+from httpx import AsyncClient, Headers
+
+from app.core.timing import ServerTimingMiddleware, server_timing_header
+from app.main import app
+from app.tests.conftest import TEST_URL
+
+
+def test_server_timing_header():
+    header = server_timing_header([("sql", 0.0012, "SELECT")], total=0.003)
+
+    assert header == 'sql;dur=1.20;desc="SELECT", total;dur=3.00'
+
+
+@pytest.mark.asyncio
+async def test_server_timing_middleware(headers: Headers):
+    timed_app = ServerTimingMiddleware(app)
+
+    async with AsyncClient(app=timed_app, base_url=TEST_URL) as client:
+        client.headers = headers
+        response = await client.get("users")
+
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    server_timing = response.headers["Server-Timing"]
+    assert "db-session;dur=" in server_timing
+    assert "jwt-verify;dur=" in server_timing
+    assert "sql;dur=" in server_timing
+    assert "total;dur=" in server_timing
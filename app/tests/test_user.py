@@ -6,10 +6,15 @@ from typing import Final
 import pytest
 from fastapi import status
 from httpx import AsyncClient
+from sqlalchemy import event
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.api.v1.user_cache import user_stats_cache
+from app.core.db import async_engine
 from app.models import UserDB
+from app.models.user import BULK_MAX_PASSWORDS
 from app.security import password
+from app.utils.uuid7 import uuid7
 
 ENDPOINT: Final = "users"
 USER_ID: Final = "38eb651b-bd33-4f9a-beb2-0f9d52d7acc6"
@@ -114,6 +119,17 @@ async def test_get_users_list(client: AsyncClient, session: AsyncSession):
     assert len(response.json()["result"]) == 4
     assert isinstance(response.json()["result"], list)
 
+    uids = [user["uid"] for user in response.json()["result"]]
+    assert uids == sorted(uids, key=uuid.UUID)
+    response = await client.get(ENDPOINT, params={"limit": 3})
+    assert [user["uid"] for user in response.json()["result"]] == uids[:3]
+    assert response.json()["next"] == uids[2]
+    response = await client.get(
+        ENDPOINT, params={"limit": 3, "after": response.json()["next"]}
+    )
+    assert [user["uid"] for user in response.json()["result"]] == uids[3:]
+    assert response.json()["next"] is None
+
 
 @pytest.mark.asyncio
 async def test_get_user_by_uid(client: AsyncClient, session: AsyncSession):
@@ -137,6 +153,37 @@ async def test_get_user_by_uid(client: AsyncClient, session: AsyncSession):
     assert response.json()["uid"] == str(user.uid)
 
 
+@pytest.mark.asyncio
+async def test_sparse_fieldset(client: AsyncClient, session: AsyncSession):
+    response = await client.get(ENDPOINT, params={"fields": "uid,username"})
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    user = response.json()["result"][0]
+    assert set(user) == {"uid", "username"}
+
+    user = UserDB(
+        first_name="yemane",
+        last_name="medhanie",
+        email="user3@zaer.com",
+        username="user3",
+        hashed_password=password.get_password_hash("password"),
+        created_by=uuid.UUID(USER_ID),
+        modified_by=uuid.UUID(USER_ID),
+    )
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+
+    response = await client.get(
+        f"{ENDPOINT}/{user.uid}", params={"fields": "is_active, uid"}
+    )
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert response.json() == {"is_active": True, "uid": str(user.uid)}
+
+    response = await client.get(ENDPOINT, params={"fields": "uid,hashed_password"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.json()
+    assert response.json()["detail"] == "unknown fields: hashed_password."
+
+
 @pytest.mark.asyncio
 async def test_user_not_found(client: AsyncClient, session: AsyncSession):
     response = await client.get(f"{ENDPOINT}/{uuid.uuid4()}")
@@ -181,3 +228,190 @@ async def test_can_update_user(client: AsyncClient, session: AsyncSession):
     assert response.json()["email"] == "newuser@zaer.com"
     assert response.json()["is_superuser"]
     assert password.verify_password("newpassword", user.hashed_password)
+
+
+@pytest.mark.asyncio
+async def test_conditional_requests(client: AsyncClient, session: AsyncSession):
+    user = UserDB(
+        first_name="yemane",
+        last_name="medhanie",
+        email="user3@zaer.com",
+        username="user3",
+        hashed_password=password.get_password_hash("password"),
+        created_by=uuid.UUID(USER_ID),
+        modified_by=uuid.UUID(USER_ID),
+    )
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+
+    response = await client.get(f"{ENDPOINT}/{user.uid}")
+    etag = response.headers["ETag"]
+    response = await client.get(
+        f"{ENDPOINT}/{user.uid}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    response = await client.patch(
+        f"{ENDPOINT}/{user.uid}", json={"last_name": "alex"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert response.headers["ETag"] != etag
+
+    response = await client.patch(
+        f"{ENDPOINT}/{user.uid}", json={"last_name": "abel"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    response = await client.get(f"{ENDPOINT}/{user.uid}")
+    assert response.json()["last_name"] == "alex"
+
+
+def test_uuid7_is_time_ordered():
+    uids = [uuid7() for _ in range(1000)]
+    assert all(uid.version == 7 for uid in uids)
+    assert uids == sorted(uids)
+
+
+@pytest.mark.asyncio
+async def test_search_users(client: AsyncClient, session: AsyncSession):
+    hashed_password = password.get_password_hash("password")
+    for first_name, username in [
+        ("semere", "user1"),
+        ("selam", "user2"),
+        ("yemane", "sem_3"),
+    ]:
+        session.add(
+            UserDB(
+                first_name=first_name,
+                last_name="tewelde",
+                email=f"{username}@zaer.com",
+                username=username,
+                hashed_password=hashed_password,
+                created_by=uuid.UUID(USER_ID),
+                modified_by=uuid.UUID(USER_ID),
+            )
+        )
+    await session.commit()
+
+    response = await client.get(f"{ENDPOINT}/search", params={"q": "SEM"})
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert {u["username"] for u in response.json()["result"]} == {"user1", "sem_3"}
+
+    # like wildcards are matched literally.
+    response = await client.get(f"{ENDPOINT}/search", params={"q": "sem_"})
+    assert [u["username"] for u in response.json()["result"]] == ["sem_3"]
+
+    response = await client.get(f"{ENDPOINT}/search", params={"q": "se", "limit": 2})
+    first_page = response.json()
+    assert first_page["count"] == 2
+    params = {"q": "se", "limit": 2, "after": first_page["next"]}
+    response = await client.get(f"{ENDPOINT}/search", params=params)
+    assert response.json()["count"] == 1
+    assert response.json()["next"] is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_and_deactivate(
+    client: AsyncClient, session: AsyncSession, user: UserDB
+):
+    hashed_password = password.get_password_hash("password")
+    users = [
+        UserDB(
+            first_name="semere",
+            last_name="tewelde",
+            email=f"user{i}@zaer.com",
+            username=f"user{i}",
+            hashed_password=hashed_password,
+            created_by=uuid.UUID(USER_ID),
+            modified_by=uuid.UUID(USER_ID),
+        )
+        for i in range(3)
+    ]
+    session.add_all(users)
+    await session.commit()
+    missing = uuid.uuid4()
+
+    payload = {
+        "users": [
+            {"uid": str(users[0].uid), "last_name": "ABEL", "password": "new"},
+            {"uid": str(users[1].uid), "is_staff": True},
+            {"uid": str(missing), "is_staff": True},
+        ]
+    }
+    response = await client.post(f"{ENDPOINT}/bulk-update", json=payload)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert response.json()["updated"] == 2
+    assert [r["status"] for r in response.json()["result"]] == [
+        "updated",
+        "updated",
+        "not_found",
+    ]
+    for user in users:
+        await session.refresh(user)
+    assert users[0].last_name == "abel" and users[0].first_name == "semere"
+    assert password.verify_password("new", users[0].hashed_password)
+    assert users[1].is_staff and not users[2].is_staff
+    # the token subject of the client.
+    assert users[0].modified_by == user.uid
+
+    payload = {
+        "users": [
+            {"uid": str(uuid.uuid4()), "password": "new"}
+            for _ in range(BULK_MAX_PASSWORDS + 1)
+        ]
+    }
+    response = await client.post(f"{ENDPOINT}/bulk-update", json=payload)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    # a conflict on one user rolls back the whole update.
+    payload = {
+        "users": [
+            {"uid": str(users[1].uid), "last_name": "medhanie"},
+            {"uid": str(users[2].uid), "username": "user0"},
+        ]
+    }
+    response = await client.post(f"{ENDPOINT}/bulk-update", json=payload)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    await session.refresh(users[1])
+    assert users[1].last_name == "tewelde"
+
+    payload = {"uids": [str(users[0].uid), str(missing)]}
+    response = await client.post(f"{ENDPOINT}/bulk-deactivate", json=payload)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert response.json()["updated"] == 1
+    await session.refresh(users[0])
+    assert not users[0].is_active
+
+
+@pytest.mark.asyncio
+async def test_user_stats(client: AsyncClient, session: AsyncSession):
+    user_stats_cache.invalidate()
+    response = await client.get(f"{ENDPOINT}/stats")
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    # the superuser of the client fixture.
+    assert response.json() == {"total": 1, "active": 1, "staff": 1, "superusers": 1}
+
+    payload = copy.deepcopy(USER_TEST_DATA)
+    response = await client.post(f"/{ENDPOINT}", json=payload)
+    assert response.status_code == status.HTTP_201_CREATED, response.json()
+
+    response = await client.get(f"{ENDPOINT}/stats")
+    assert response.json() == {"total": 2, "active": 2, "staff": 1, "superusers": 1}
+
+
+@pytest.mark.asyncio
+async def test_cached_user_stats_need_no_connection(client: AsyncClient):
+    user_stats_cache.invalidate()
+    response = await client.get(f"{ENDPOINT}/stats")
+    assert response.status_code == status.HTTP_200_OK, response.json()
+
+    checkouts = []
+    event.listen(async_engine.sync_engine, "checkout", checkouts.append)
+    try:
+        response = await client.get(f"{ENDPOINT}/stats")
+    finally:
+        event.remove(async_engine.sync_engine, "checkout", checkouts.append)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    # no pooled connection, so no BEGIN, SET LOCAL or query either.
+    assert checkouts == []
@@ -0,0 +1,54 @@
+"""User repository caching tests module."""
+import pytest
+
+from app.api.v1.user_cache import CachedUserRepository, StatsCache
+from app.api.v1.user_memory import InMemoryUserRepository
+from app.models.user import UserStats, UserUpdate
+from app.tests.test_user_memory import CREATOR, user_create
+
+
+@pytest.mark.asyncio
+async def test_stats_invalidated_on_writes():
+    repository = InMemoryUserRepository()
+    users = CachedUserRepository(repository, StatsCache(ttl=60))
+    user = await users.create_user(user_create(1))
+    assert (await users.stats()).total == 1
+
+    # written around the cache, the cached stats are served.
+    await repository.create_user(user_create(2))
+    assert (await users.stats()).total == 1
+    assert users.cache.hits == 1
+
+    # updates of fields that are not counted keep the stats.
+    await users.update_user(user.uid, UserUpdate(last_name="x", modified_by=CREATOR))
+    assert (await users.stats()).total == 1
+
+    await users.update_user(user.uid, UserUpdate(is_staff=True, modified_by=CREATOR))
+    stats = await users.stats()
+    assert (stats.total, stats.staff) == (2, 1)
+
+    await users.deactivate_many([user.uid], CREATOR)
+    assert (await users.stats()).active == 1
+
+
+def test_stale_read_is_not_cached():
+    cache = StatsCache(ttl=60)
+    generation = cache.generation
+    cache.invalidate()
+    cache.put(object(), generation)  # type: ignore
+    assert cache.get() is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_reads_on_a_miss_only():
+    cache = StatsCache(ttl=60)
+    stats = UserStats(total=1, active=1, staff=0, superusers=0)
+    reads = []
+
+    async def read() -> UserStats:
+        reads.append(1)
+        return stats
+
+    assert await cache.fetch(read) is stats
+    assert await cache.fetch(read) is stats
+    assert len(reads) == 1 and (cache.hits, cache.misses) == (1, 1)
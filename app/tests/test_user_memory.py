@@ -0,0 +1,127 @@
+"""In process user repository tests module."""
+import uuid
+
+import orjson
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.api.v1.user_crud import PreconditionFailed
+from app.api.v1.user_memory import InMemoryUserRepository
+from app.api.v1.user_repository import prepared_many
+from app.models.user import UserCreate, UserUpdate
+from app.security import password
+
+CREATOR = uuid.uuid4()
+
+
+def user_create(i: int) -> UserCreate:
+    return UserCreate(
+        first_name="Hosanna",
+        last_name=f"Abel{i}",
+        username=f"Hosi{i}",
+        email=f"hosi{i}@zaer.com",
+        password="password",
+        created_by=CREATOR,
+        modified_by=CREATOR,
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_and_read():
+    users = InMemoryUserRepository()
+    user = await users.create_user(user_create(1))
+    assert user.username == "hosi1"
+    assert (await users.read_by_uid(user.uid)).email == "hosi1@zaer.com"
+
+    credentials = await users.read_login_credentials(" HOSI1@zaer.com ")
+    assert credentials.uid == user.uid and credentials.is_active
+
+    with pytest.raises(IntegrityError):
+        await users.create_user(user_create(1))
+
+    # a username that is another user's email wins, like in postgres.
+    other = user_create(2)
+    other.username = "hosi1@zaer.com"
+    other_user = await users.create_user(other)
+    credentials = await users.read_login_credentials("hosi1@zaer.com")
+    assert credentials.uid == other_user.uid
+
+    etag, content = await users.read_json_by_uid(user.uid, ("username",))
+    assert orjson.loads(content) == {"username": "hosi1"}
+    assert await users.read_json_by_uid(user.uid, ("username",), [etag]) == (
+        etag,
+        None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_pages_and_search():
+    users = InMemoryUserRepository()
+    created = [await users.create_user(user_create(i)) for i in range(5)]
+    await users.delete_user(created[0].uid)
+
+    page = orjson.loads(await users.read_many_json(limit=2, is_active=True))
+    assert [u["uid"] for u in page["result"]] == [str(u.uid) for u in created[1:3]]
+    page = orjson.loads(
+        await users.read_many_json(after=uuid.UUID(page["next"]), limit=2)
+    )
+    assert page["count"] == 2
+
+    page = orjson.loads(await users.search_json("abel3", limit=10))
+    assert page["count"] == 1 and page["result"][0]["uid"] == str(created[3].uid)
+
+
+@pytest.mark.asyncio
+async def test_update():
+    users = InMemoryUserRepository()
+    first, second = [await users.create_user(user_create(i)) for i in range(2)]
+
+    with pytest.raises(IntegrityError):
+        await users.update_user(
+            second.uid, UserUpdate(username="hosi0", modified_by=CREATOR)
+        )
+    with pytest.raises(PreconditionFailed):
+        await users.update_user(
+            first.uid,
+            UserUpdate(first_name="x", modified_by=CREATOR),
+            if_match=[second.date_modified.replace(year=2000)],
+        )
+
+    updated = await users.update_user(
+        first.uid,
+        UserUpdate(username="New", modified_by=CREATOR),
+        if_match=[first.date_modified],
+    )
+    assert updated.username == "new"
+    assert await users.read_by_username("hosi0") is None
+    assert (await users.read_login_credentials("new")).uid == first.uid
+
+
+@pytest.mark.asyncio
+async def test_bulk_update():
+    users = InMemoryUserRepository()
+    first, second = [await users.create_user(user_create(i)) for i in range(2)]
+    missing = uuid.uuid4()
+
+    prepared = await prepared_many([{"last_name": "New", "password": "new"}])
+    updated = await users.bulk_update(
+        {first.uid: prepared[0], missing: {"is_staff": True}}, modified_by=CREATOR
+    )
+    assert updated == {first.uid}
+    user = await users.read_by_uid(first.uid)
+    assert user.last_name == "new" and user.first_name == "hosanna"
+    assert password.verify_password("new", user.hashed_password)
+
+    # a conflict on one user leaves all of them unchanged.
+    with pytest.raises(IntegrityError):
+        await users.bulk_update(
+            {
+                first.uid: {"last_name": "other"},
+                second.uid: {"email": "hosi0@zaer.com"},
+            },
+            modified_by=CREATOR,
+        )
+    assert (await users.read_by_uid(first.uid)).last_name == "new"
+
+    assert await users.deactivate_many([second.uid, missing], CREATOR) == {second.uid}
+    assert not (await users.read_login_credentials("hosi1")).is_active
@@ -0,0 +1,28 @@
+"""Time ordered uuid version 7 generation module."""
+import os
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+# last unix millisecond timestamp and 12 bit counter, as one integer.
+_last = 0
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Get a uuid version 7, ordered by creation time.
+
+    The 12 bit `rand_a` field is a counter, so uuids of the same process
+    stay monotonic within a millisecond, the 62 bit `rand_b` is random.
+    """
+    global _last
+    with _lock:
+        now = time.time_ns() // 1_000_000 << 12
+        _last = now if now > _last else _last + 1
+        value = _last
+    timestamp, counter = value >> 12, value & 0xFFF
+    random = int.from_bytes(os.urandom(8), "big") & (1 << 62) - 1
+    return uuid.UUID(
+        int=timestamp << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | random
+    )
@@ -0,0 +1 @@
+"""ZaEr auth performance benchmarks package."""
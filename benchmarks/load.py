@@ -0,0 +1,342 @@
+"""End to end load benchmark module.
+
+Drives the application in process through `httpx.AsyncClient(app=...)`, or
+a running server with `--url`, and reports latency percentiles and
+throughput per scenario. Benchmark users are inserted straight into the
+configured database and removed afterwards, or into the database named
+by `--seed-db-url` with `--url`, which must be the one of that server.
+With `USER_BACKEND=memory` they are kept in process instead, which
+measures the cost of the app without database latency (in process runs
+only).
+
+Usage:
+    python -m benchmarks.load --scenario login --concurrency 32 --requests 2000
+    python -m benchmarks.load --url http://localhost:8000 \
+        --seed-db-url postgresql+asyncpg://user:password@db:5432/zaer_auth
+    python -m benchmarks.load --save-baseline benchmarks/baseline.json
+    python -m benchmarks.load --baseline benchmarks/baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Optional, Union
+
+from fastapi_jwt_auth import AuthJWT  # type: ignore
+from httpx import AsyncClient, Response
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import SQLModel
+
+from app.api.v1.user_memory import memory_users
+from app.core.admission import login_ip_throttle, login_username_throttle
+from app.core.db import async_engine
+from app.core.settings import settings
+from app.main import app
+from app.models.user import UserDB
+from app.security import password
+from app.utils.uuid7 import uuid7
+
+USERNAME_PREFIX = "bench_"
+PASSWORD = "bench-password"
+
+
+@dataclass
+class Fixture:
+    """Data the scenarios run against."""
+
+    token: str
+    usernames: list[str]
+    uids: list[uuid.UUID]
+
+
+@dataclass
+class Result:
+    """Latency and throughput of one scenario run."""
+
+    scenario: str
+    requests: int
+    concurrency: int
+    errors: int
+    shed: int
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    mean: float
+
+
+Scenario = Callable[[AsyncClient, Fixture, int], Awaitable[Response]]
+
+
+def _auth(fixture: Fixture) -> dict[str, str]:
+    return {"Authorization": f"Bearer {fixture.token}"}
+
+
+async def login_storm(client: AsyncClient, fixture: Fixture, i: int) -> Response:
+    """Log in as a random benchmark user."""
+    username = random.choice(fixture.usernames)
+    return await client.post("login", json={"username": username, "password": PASSWORD})
+
+
+async def read_user(client: AsyncClient, fixture: Fixture, i: int) -> Response:
+    """Read a random benchmark user with a bearer token."""
+    uid = random.choice(fixture.uids)
+    return await client.get(f"users/{uid}", headers=_auth(fixture))
+
+
+async def list_users(client: AsyncClient, fixture: Fixture, i: int) -> Response:
+    """List a page of users after a random one."""
+    params: dict[str, Union[str, int]] = {
+        "limit": 100,
+        "after": str(random.choice(fixture.uids)),
+    }
+    return await client.get("users", params=params, headers=_auth(fixture))
+
+
+async def create_user(client: AsyncClient, fixture: Fixture, i: int) -> Response:
+    """Create a new user."""
+    username = f"{USERNAME_PREFIX}new_{uuid.uuid4().hex[:12]}"
+    payload = {
+        "first_name": "bench",
+        "last_name": "user",
+        "username": username,
+        "email": f"{username}@bench.zaer.com",
+        "password": PASSWORD,
+    }
+    return await client.post("users", json=payload, headers=_auth(fixture))
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "login": login_storm,
+    "read_user": read_user,
+    "list_users": list_users,
+    "bulk_create": create_user,
+}
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Get nearest rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = round(pct / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, rank))]
+
+
+async def seed(users: int, engine: Optional[AsyncEngine]) -> Fixture:
+    """Insert benchmark users and create a superuser token.
+
+    Users are kept in process by the memory backend when engine is None.
+    """
+    hashed_password = password.get_password_hash(PASSWORD)
+    admin_uid = uuid7()
+    rows = [
+        dict(
+            uid=uuid7(),
+            first_name="bench",
+            last_name=str(i),
+            username=f"{USERNAME_PREFIX}{i}",
+            email=f"{USERNAME_PREFIX}{i}@bench.zaer.com",
+            hashed_password=hashed_password,
+            is_superuser=i == 0,
+            is_staff=i == 0,
+            is_active=True,
+            created_by=admin_uid,
+            modified_by=admin_uid,
+        )
+        for i in range(users)
+    ]
+    rows[0]["uid"] = admin_uid
+    if engine is None:
+        now = datetime.utcnow()
+        memory_users.clear()
+        memory_users.load(
+            [{**r, "date_created": now, "date_modified": now} for r in rows]
+        )
+    else:
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+            await conn.execute(_delete_benchmark_users())
+            await conn.execute(insert(UserDB.__table__), rows)  # type: ignore
+
+    token = AuthJWT().create_access_token(
+        subject=str(admin_uid),
+        user_claims={"is_superuser": True, "is_staff": True, "is_active": True},
+    )
+    return Fixture(
+        token=token,
+        usernames=[r["username"] for r in rows],
+        uids=[r["uid"] for r in rows],
+    )
+
+
+def _delete_benchmark_users():
+    return delete(UserDB.__table__).where(  # type: ignore
+        UserDB.username.startswith(USERNAME_PREFIX)  # type: ignore
+    )
+
+
+async def cleanup(engine: Optional[AsyncEngine]) -> None:
+    """Remove benchmark users."""
+    if engine is None:
+        memory_users.clear()
+        return
+    async with engine.begin() as conn:
+        await conn.execute(_delete_benchmark_users())
+    await engine.dispose()
+
+
+def seed_engine(args: argparse.Namespace) -> Optional[AsyncEngine]:
+    """Get engine of the database the benchmarked app reads users from."""
+    if args.url:
+        return create_async_engine(args.seed_db_url)
+    if settings.user_backend == "memory":
+        return None
+    return async_engine
+
+
+async def run_scenario(
+    client: AsyncClient,
+    fixture: Fixture,
+    name: str,
+    requests: int,
+    concurrency: int,
+    warmup: int = 10,
+) -> Result:
+    """Run scenario with `concurrency` workers until `requests` are sent."""
+    scenario = SCENARIOS[name]
+    for i in range(warmup):
+        await scenario(client, fixture, i)
+
+    latencies: list[float] = []
+    errors = shed = 0
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors, shed
+        for i in counter:
+            start = perf_counter()
+            response = await scenario(client, fixture, i)
+            latencies.append(perf_counter() - start)
+            if response.status_code in (429, 503):
+                shed += 1
+            elif response.status_code >= 400:
+                errors += 1
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - start
+
+    latencies.sort()
+    return Result(
+        scenario=name,
+        requests=requests,
+        concurrency=concurrency,
+        errors=errors,
+        shed=shed,
+        throughput=round(requests / elapsed, 2),
+        p50=round(percentile(latencies, 50) * 1000, 3),
+        p95=round(percentile(latencies, 95) * 1000, 3),
+        p99=round(percentile(latencies, 99) * 1000, 3),
+        mean=round(sum(latencies) / len(latencies) * 1000, 3),
+    )
+
+
+def compare(
+    results: list[Result], baseline: dict[str, dict], tolerance: float
+) -> list[str]:
+    """Get regressions of results against a saved baseline."""
+    regressions = []
+    for result in results:
+        base = baseline.get(result.scenario)
+        if base is None:
+            continue
+        if result.p95 > base["p95"] * (1 + tolerance):
+            regressions.append(
+                f"{result.scenario}: p95 {result.p95}ms > baseline {base['p95']}ms"
+            )
+        if result.throughput < base["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{result.scenario}: throughput {result.throughput}/s"
+                f" < baseline {base['throughput']}/s"
+            )
+    return regressions
+
+
+def client_for(url: Optional[str]) -> AsyncClient:
+    """Get client for a running server, or for the app in process."""
+    if url:
+        return AsyncClient(base_url=f"{url}{settings.api_v1_prefix}/", timeout=60)
+    return AsyncClient(app=app, base_url=f"http://bench{settings.api_v1_prefix}/")
+
+
+async def main(args: argparse.Namespace) -> int:
+    """Run benchmarks and report results."""
+    if args.disable_throttle:
+        for throttle in (login_ip_throttle, login_username_throttle):
+            throttle.rate = throttle.burst = 10**9
+
+    engine = seed_engine(args)
+    fixture = await seed(args.users, engine)
+    try:
+        async with client_for(args.url) as client:
+            results = [
+                await run_scenario(
+                    client, fixture, name, args.requests, args.concurrency
+                )
+                for name in args.scenario or SCENARIOS
+            ]
+    finally:
+        await cleanup(engine)
+
+    for result in results:
+        print(json.dumps(asdict(result)))
+    report = {r.scenario: asdict(r) for r in results}
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS))
+    parser.add_argument("--url", help="base url of a running server.")
+    parser.add_argument(
+        "--seed-db-url",
+        help="database of the server at --url, benchmark users are written to it.",
+    )
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--baseline", help="baseline json to compare against.")
+    parser.add_argument("--save-baseline", help="write results as new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument(
+        "--disable-throttle",
+        action="store_true",
+        help="lift in process login throttling to measure raw login cost.",
+    )
+    args = parser.parse_args(argv)
+    if args.url and not args.seed_db_url:
+        parser.error("--url needs --seed-db-url, the database of that server.")
+    if args.requests < 1 or args.concurrency < 1:
+        parser.error("--requests and --concurrency must be at least 1.")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,195 @@
+"""Microbenchmarks of the security and serialization primitives.
+
+Results are written as one json document so they can be tracked across
+releases, eg. by archiving it per tag.
+
+Usage:
+    python -m benchmarks.micro --output micro.json
+    python -m benchmarks.micro --only bcrypt --only jwt
+"""
+import argparse
+import json
+import os
+import platform
+import secrets
+import statistics
+import subprocess
+import sys
+import timeit
+import uuid
+from collections.abc import Callable, Iterator
+from datetime import datetime
+from functools import partial
+from typing import Any, Optional
+
+import jwt  # type: ignore
+import orjson
+
+from app.core.settings import settings
+from app.models.user import UserRead, UserReadMany
+from app.security import keys, password
+
+BCRYPT_ROUNDS = (4, 8, 10, 12)
+RSA_ALGORITHMS = ("RS256", "RS384", "RS512", "PS256", "PS384", "PS512")
+HMAC_ALGORITHMS = ("HS256", "HS384", "HS512")
+ROW_COUNTS = (1, 1_000, 100_000)
+
+Benchmark = tuple[str, dict[str, Any], Callable[[], Any]]
+
+
+def measure(func: Callable[[], Any], repeat: int, min_time: float) -> dict[str, Any]:
+    """Time func, calls per repetition are calibrated to last `min_time`."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    timings = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min_us": round(min(timings) * 1e6, 3),
+        "median_us": round(statistics.median(timings) * 1e6, 3),
+        "ops_per_sec": round(1 / min(timings), 2),
+    }
+
+
+def user_rows(count: int) -> list[dict[str, Any]]:
+    """Get rows shaped like the `auth_user` columns of `UserRead`."""
+    now = datetime.utcnow()
+    creator = uuid.uuid4()
+    return [
+        dict(
+            uid=uuid.uuid4(),
+            first_name="hosanna",
+            last_name="abel",
+            username=f"user{i}",
+            email=f"user{i}@zaer.com",
+            is_superuser=False,
+            is_staff=False,
+            is_active=True,
+            date_created=now,
+            date_modified=now,
+            last_login=None,
+            created_by=creator,
+            modified_by=creator,
+        )
+        for i in range(count)
+    ]
+
+
+def bcrypt_benchmarks() -> Iterator[Benchmark]:
+    """Password hashing and verification at several cost settings."""
+    for rounds in BCRYPT_ROUNDS:
+        context = password.pwd_context.copy(bcrypt__rounds=rounds)
+        hashed = context.hash("password")
+        params = {"rounds": rounds}
+        yield "bcrypt.hash", params, partial(context.hash, "password")
+        yield "bcrypt.verify", params, partial(context.verify, "password", hashed)
+    hashed = password.get_password_hash("password")
+    yield "password.verify_password", {}, partial(
+        password.verify_password, "password", hashed
+    )
+
+
+def key_benchmarks() -> Iterator[Benchmark]:
+    """Loading of the pem key pair."""
+    for key in ("private", "public"):
+        yield "keys.get_assymetric_key", {"key": key}, partial(
+            keys.get_assymetric_key, key
+        )
+
+
+def jwt_benchmarks() -> Iterator[Benchmark]:
+    """Token signing and verification for each supported algorithm."""
+    payload = {"sub": str(uuid.uuid4()), "is_superuser": True, "is_active": True}
+    secret = secrets.token_hex(32)
+    private_key, public_key = settings.authjwt_private_key, settings.authjwt_public_key
+    pairs = [(a, private_key, public_key) for a in RSA_ALGORITHMS]
+    pairs += [(a, secret, secret) for a in HMAC_ALGORITHMS]
+    for algorithm, signing_key, verifying_key in pairs:
+        token = jwt.encode(payload, signing_key, algorithm=algorithm)
+        params = {"algorithm": algorithm}
+        yield "jwt.sign", params, partial(
+            jwt.encode, payload, signing_key, algorithm=algorithm
+        )
+        yield "jwt.verify", params, partial(
+            jwt.decode, token, verifying_key, algorithms=[algorithm]
+        )
+
+
+def serialization_benchmarks() -> Iterator[Benchmark]:
+    """Validation and json serialization of user read models."""
+    for count in ROW_COUNTS:
+        rows = user_rows(count)
+        model = UserReadMany(count=count, result=rows)
+        params = {"rows": count}
+        yield "UserReadMany.validate", params, partial(
+            UserReadMany, count=count, result=rows
+        )
+        yield "UserReadMany.json", params, model.json
+        # read path of the api, rows go straight from the db to json bytes.
+        yield "orjson.rows", params, partial(
+            orjson.dumps, {"count": count, "result": rows}
+        )
+        if count == 1:
+            yield "UserRead.validate", params, partial(UserRead, **rows[0])
+
+
+GROUPS: dict[str, Callable[[], Iterator[Benchmark]]] = {
+    "bcrypt": bcrypt_benchmarks,
+    "keys": key_benchmarks,
+    "jwt": jwt_benchmarks,
+    "serialization": serialization_benchmarks,
+}
+
+
+def metadata() -> dict[str, Any]:
+    """Describe the environment the benchmarks ran in."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "version": settings.version,
+        "commit": commit,
+        "date": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run(groups: list[str], repeat: int, min_time: float) -> dict[str, Any]:
+    """Run benchmark groups and collect the results."""
+    results = []
+    for group in groups:
+        for name, params, func in GROUPS[group]():
+            result = {"group": group, "name": name, "params": params}
+            result.update(measure(func, repeat, min_time))
+            if "rows" in params:
+                result["rows_per_sec"] = round(params["rows"] * result["ops_per_sec"])
+            print(json.dumps(result), file=sys.stderr)
+            results.append(result)
+    return {"meta": metadata(), "results": results}
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", action="append", choices=list(GROUPS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--output", help="write results json to this file.")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run(args.only or list(GROUPS), args.repeat, args.min_time)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
@@ -0,0 +1,180 @@
+"""Traffic trace replay and comparison module.
+
+Replays a trace recorded by `TrafficCaptureMiddleware` against the app in
+process, or a running server with `--url`, at the original pace scaled by
+`--speed` (`0` sends every request as fast as possible). Since the trace
+only holds request shapes, requests are rebuilt from the benchmark
+fixture of `benchmarks.load`, seeded into the database named by
+`--seed-db-url` with `--url`. Per route latencies are written as json and
+two such reports, eg. of two builds, can be compared.
+
+Usage:
+    python -m benchmarks.replay run trace.jsonl --output before.json
+    python -m benchmarks.replay run trace.jsonl --speed 2 --output after.json
+    python -m benchmarks.replay compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Optional
+
+from httpx import AsyncClient, Response
+
+from app.core.settings import settings
+from app.main import app
+from benchmarks.load import PASSWORD, Fixture, cleanup, percentile, seed, seed_engine
+
+
+def load_trace(path: str) -> list[dict[str, Any]]:
+    """Load trace records ordered by time."""
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(records, key=lambda r: r["ts"])
+
+
+async def send(client: AsyncClient, fixture: Fixture, record: dict) -> Response:
+    """Rebuild the request of a trace record and send it."""
+    method, route = record["method"], record["route"]
+    path = route.replace("{user_uid}", str(random.choice(fixture.uids)))
+    headers = {"Authorization": f"Bearer {fixture.token}"}
+    body: Optional[dict] = None
+    if route == f"{settings.api_v1_prefix}/login":
+        body = {"username": random.choice(fixture.usernames), "password": PASSWORD}
+    elif method == "POST" and route == f"{settings.api_v1_prefix}/users":
+        username = f"bench_replay_{uuid.uuid4().hex[:12]}"
+        body = {
+            "first_name": "replay",
+            "last_name": "user",
+            "username": username,
+            "email": f"{username}@bench.zaer.com",
+            "password": PASSWORD,
+        }
+    elif method == "PATCH":
+        body = {"last_name": "replayed"}
+    return await client.request(method, path, json=body, headers=headers)
+
+
+async def replay(
+    client: AsyncClient, fixture: Fixture, records: list[dict], speed: float
+) -> dict[str, Any]:
+    """Replay records and get latency statistics per route."""
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    start_ts = records[0]["ts"] if records else 0.0
+    start = perf_counter()
+
+    async def timed(record: dict) -> None:
+        key = f"{record['method']} {record['route']}"
+        request_start = perf_counter()
+        response = await send(client, fixture, record)
+        latencies[key].append(perf_counter() - request_start)
+        if response.status_code >= 400:
+            errors[key] += 1
+
+    tasks = []
+    for record in records:
+        if speed > 0:
+            delay = (record["ts"] - start_ts) / speed - (perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(timed(record)))
+    await asyncio.gather(*tasks)
+    elapsed = perf_counter() - start
+
+    routes = {}
+    for key, values in latencies.items():
+        values.sort()
+        routes[key] = {
+            "requests": len(values),
+            "errors": errors[key],
+            "p50": round(percentile(values, 50) * 1000, 3),
+            "p95": round(percentile(values, 95) * 1000, 3),
+            "p99": round(percentile(values, 99) * 1000, 3),
+        }
+    return {
+        "requests": len(records),
+        "elapsed": round(elapsed, 3),
+        "throughput": round(len(records) / elapsed, 2) if elapsed else 0.0,
+        "routes": routes,
+    }
+
+
+def compare(before: dict[str, Any], after: dict[str, Any]) -> list[dict[str, Any]]:
+    """Get per route latency differences of two replay reports."""
+    rows = []
+    for key in sorted(set(before["routes"]) | set(after["routes"])):
+        old, new = before["routes"].get(key), after["routes"].get(key)
+        if old is None or new is None:
+            missing_in = "before" if old is None else "after"
+            rows.append({"route": key, "missing_in": missing_in})
+            continue
+        row: dict[str, Any] = {"route": key}
+        for stat in ("p50", "p95", "p99"):
+            diff = new[stat] - old[stat]
+            row[f"{stat}_diff_ms"] = round(diff, 3)
+            row[f"{stat}_diff_pct"] = (
+                round(diff / old[stat] * 100, 1) if old[stat] else None
+            )
+        rows.append(row)
+    return rows
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Replay a trace file."""
+    records = load_trace(args.trace)
+    engine = seed_engine(args)
+    fixture = await seed(args.users, engine)
+    try:
+        if args.url:
+            client = AsyncClient(base_url=args.url, timeout=60)
+        else:
+            client = AsyncClient(app=app, base_url="http://replay")
+        async with client:
+            report = await replay(client, fixture, records, args.speed)
+    finally:
+        await cleanup(engine)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="replay a trace.")
+    run_parser.add_argument("trace")
+    run_parser.add_argument("--url", help="base url of a running server.")
+    run_parser.add_argument(
+        "--seed-db-url",
+        help="database of the server at --url, benchmark users are written to it.",
+    )
+    run_parser.add_argument("--speed", type=float, default=1.0)
+    run_parser.add_argument("--users", type=int, default=1000)
+    run_parser.add_argument("--output", help="write report json to this file.")
+    compare_parser = commands.add_parser("compare", help="compare two reports.")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    args = parser.parse_args(argv)
+    if args.command == "run" and args.url and not args.seed_db_url:
+        run_parser.error("--url needs --seed-db-url, the database of that server.")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "compare":
+        before = json.loads(Path(args.before).read_text())
+        after = json.loads(Path(args.after).read_text())
+        for row in compare(before, after):
+            print(json.dumps(row))
+        sys.exit(0)
+    asyncio.run(run(args))
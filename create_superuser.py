@@ -9,6 +9,7 @@ import asyncpg
 from pydantic import BaseModel, EmailStr, Field
 
 from app.security import password as pwd
+from app.utils.uuid7 import uuid7
 
 
 class SuperuserCreate(BaseModel):
@@ -97,7 +98,7 @@ if __name__ == "__main__":
         sys.exit(1)
     hashed_password = pwd.get_password_hash(password)
 
-    user_uid = uuid.uuid4()
+    user_uid = uuid7()
 
     user = SuperuserCreate(
         uid=user_uid,